@@ -2,24 +2,26 @@
 # Copyright 2021 Canonical Ltd.
 # See LICENSE file for licensing details.
 
-from pathlib import Path
+import hashlib
+import json
+import logging
+import re
+import time
+from pathlib import Path, PurePosixPath
 
+import yaml
 from charmed_kubeflow_chisme.components import (
     CharmReconciler,
     LeadershipGateComponent,
-    SdiRelationBroadcasterComponent,
 )
 from charmed_kubeflow_chisme.components.pebble_component import (
     LazyContainerFileTemplate,
 )
-from charms.grafana_k8s.v0.grafana_dashboard import GrafanaDashboardProvider
-from charms.loki_k8s.v1.loki_push_api import LogForwarder
-from charms.observability_libs.v1.kubernetes_service_patch import KubernetesServicePatch
-from charms.prometheus_k8s.v0.prometheus_scrape import MetricsEndpointProvider
-from lightkube.models.core_v1 import ServicePort
-from ops import main
-from ops.charm import CharmBase
+from ops import ActiveStatus, StoredState, main
+from ops.charm import ActionEvent, CharmBase
+from ops.pebble import PathError
 
+from components.envoy_runtime import EnvoyRuntimeComponent, RuntimeOverridesError
 from components.istio_ambient_requirer_component import AmbientMeshRequirerComponent
 from components.istio_relations_conflict_detector import (
     IstioRelationsConflictDetector,
@@ -28,19 +30,80 @@ from components.k8s_service_info_requirer_component import (
     K8sServiceInfoRequirerComponent,
 )
 from components.pebble import EnvoyPebbleService, EnvoyPebbleServiceInputs
+from components.sdi_relation_broadcaster_component import (
+    CachedSdiRelationBroadcasterComponent,
+)
+from deferred_imports import DeferredImport, is_relevant_to_hook
+from envoy_admin import EnvoyAdminClient, EnvoyAdminError
+from envoy_config_diff import (
+    BOOTSTRAP_DUMP_TYPE,
+    diff_config,
+    get_dump_section,
+    get_live_clusters,
+    get_warming_clusters,
+)
+from envoy_profiler import EnvoyProfiler, remove_old_profiles
+from envoy_stats import (
+    INGRESS_STAT_PREFIX,
+    UPSTREAM_STAT_PREFIX,
+    StatsSnapshot,
+    counter_deltas,
+    format_status_summary,
+    memory_deltas,
+    summarize,
+)
+from hook_timing import HookTimer
+from lightkube_client import LazyLightkubeClient
+
+# Charm libraries are imported only on the hooks that need them, see is_relevant_to_hook
+GrafanaDashboardProvider = DeferredImport("dashboard_provider", "CachedGrafanaDashboardProvider")
+KubernetesServicePatch = DeferredImport("service_patch", "CachedKubernetesServicePatch")
+LogForwarder = DeferredImport("log_forwarder", "DiffingLogForwarder")
+MetricsEndpointProvider = DeferredImport("metrics_provider", "CachedMetricsEndpointProvider")
+ServicePort = DeferredImport("lightkube.models.core_v1", "ServicePort")
 
 ENVOY_CONFIG_FILE_DESTINATION_PATH = Path("/var/lib/pebble/default/envoy-config.yaml")
 ENVOY_CONFIG_FILE_SOURCE_PATH = Path("src/templates/envoy-config.yaml.j2")
+ENVOY_CDS_FILE_DESTINATION_PATH = Path("/var/lib/pebble/default/envoy-cds.yaml")
+ENVOY_CDS_FILE_SOURCE_PATH = Path("src/templates/envoy-cds.yaml.j2")
+# Snapshots and symlink root of the disk layer of Envoy's layered runtime
+ENVOY_RUNTIME_DIR = PurePosixPath("/var/lib/pebble/default/envoy-runtime")
 GRPC_RELATION_NAME = "grpc"
 METRICS_PATH = "/stats/prometheus"
+# Counters whose rate over the update-status interval goes into the status summary
+STATUS_RATE_COUNTERS = [
+    f"{INGRESS_STAT_PREFIX}downstream_rq_total",
+    f"{UPSTREAM_STAT_PREFIX}upstream_rq_total",
+]
+# Where the profile action stores the profiles, in the charm container
+PROFILES_DIR = Path("/tmp/envoy-profiles")
+# How many runs of the profile action are kept in PROFILES_DIR, the older ones are removed
+PROFILE_RUNS_KEPT = 3
+# Hooks on which the charm libraries refresh what they publish, whatever their relation
+LIFECYCLE_HOOKS = ["install", "config-changed", "leader-elected", "upgrade-charm"]
+
+
+logger = logging.getLogger(__name__)
 
 
 class EnvoyOperator(CharmBase):
+    _stored = StoredState()
+
     def __init__(self, *args):
         super().__init__(*args)
+        # Stats of the previous update-status hook, to measure rates for the status summary
+        self._stored.set_default(status_stats={}, status_stats_time=0.0)
 
         self._container_name = next(iter(self.meta.containers))
 
+        self.hook_timer = HookTimer(mode=self.config["hook-timing"], trace_dir=self.charm_dir)
+        self.framework.observe(self.framework.on.commit, self._on_commit)
+
+        # Shared by all charm code talking to Kubernetes, only constructed if one of them does
+        self.lightkube_client = LazyLightkubeClient(
+            namespace=self.model.name, field_manager=self.app.name
+        )
+
         self.charm_reconciler = CharmReconciler(self)
 
         self.leadership_gate = self.charm_reconciler.add(
@@ -70,7 +133,7 @@ class EnvoyOperator(CharmBase):
         # charm is designed specifically to implement Envoy for KFP's metadata handling,
         # ingress is needed by KFP in Charmed Kubeflow.
         self.ingress_relation = self.charm_reconciler.add(
-            component=SdiRelationBroadcasterComponent(
+            component=CachedSdiRelationBroadcasterComponent(
                 charm=self,
                 name="relation:ingress",
                 relation_name="ingress",
@@ -84,9 +147,51 @@ class EnvoyOperator(CharmBase):
             depends_on=[self.leadership_gate, self.istio_relations_conflict_detector],
         )
 
-        self.charm_reconciler.add(
-            AmbientMeshRequirerComponent(charm=self, name="ambient-ingress-requirer"),
-            depends_on=[self.leadership_gate, self.istio_relations_conflict_detector],
+        with self.hook_timer.measure("AmbientMeshRequirerComponent", "init"):
+            self.ambient_ingress = self.charm_reconciler.add(
+                AmbientMeshRequirerComponent(
+                    charm=self,
+                    name="ambient-ingress-requirer",
+                    lightkube_client=self.lightkube_client,
+                    grpc_service_info_getter=lambda: self.grpc.component.get_service_info(),
+                ),
+                depends_on=[self.leadership_gate, self.istio_relations_conflict_detector],
+            )
+
+        # Added before Envoy, as Envoy watches the runtime directory from its start
+        self.envoy_runtime = self.charm_reconciler.add(
+            component=EnvoyRuntimeComponent(
+                charm=self,
+                name="envoy-runtime",
+                container_name=self._container_name,
+                runtime_dir=ENVOY_RUNTIME_DIR,
+                config_overrides_getter=lambda: self.config["runtime-overrides"],
+            ),
+        )
+
+        # With start-before-upstream, Envoy runs without waiting for the grpc relation, and
+        # its upstream cluster is loaded from a separate file that is updated without restarts
+        start_before_upstream = self.config["start-before-upstream"]
+        self.envoy_config_template = LazyContainerFileTemplate(
+            destination_path=ENVOY_CONFIG_FILE_DESTINATION_PATH,
+            source_template_path=ENVOY_CONFIG_FILE_SOURCE_PATH,
+            context=lambda: {
+                "admin_port": self.config["admin-port"],
+                "http_port": self.config["http-port"],
+                "start_before_upstream": start_before_upstream,
+                "cds_path": ENVOY_CDS_FILE_DESTINATION_PATH,
+                "runtime_symlink_root": self.envoy_runtime.component.symlink_root,
+                **({} if start_before_upstream else self._get_upstream_context()),
+                "log_format": self.config["log-format"],
+                "access_log_sample_percent": max(
+                    0, min(100, self.config["access-log-sample-percent"])
+                ),
+            },
+        )
+        self.envoy_cds_template = LazyContainerFileTemplate(
+            destination_path=ENVOY_CDS_FILE_DESTINATION_PATH,
+            source_template_path=ENVOY_CDS_FILE_SOURCE_PATH,
+            context=self._get_upstream_context,
         )
 
         self.envoy_pebble_container = self.charm_reconciler.add(
@@ -95,47 +200,287 @@ class EnvoyOperator(CharmBase):
                 name="envoy-component",
                 service_name="envoy",
                 container_name=self._container_name,
-                files_to_push=[
-                    LazyContainerFileTemplate(
-                        destination_path=ENVOY_CONFIG_FILE_DESTINATION_PATH,
-                        source_template_path=ENVOY_CONFIG_FILE_SOURCE_PATH,
-                        context=lambda: {
-                            "admin_port": self.config["admin-port"],
-                            "http_port": self.config["http-port"],
-                            "upstream_service": self.grpc.component.get_service_info().name,
-                            "upstream_port": self.grpc.component.get_service_info().port,
-                        },
-                    )
-                ],
+                # The clusters file first, as the config that loads it is validated on push
+                files_to_push=([self.envoy_cds_template] if start_before_upstream else [])
+                + [self.envoy_config_template],
                 inputs_getter=lambda: EnvoyPebbleServiceInputs(
-                    config_path=ENVOY_CONFIG_FILE_DESTINATION_PATH
+                    config_path=ENVOY_CONFIG_FILE_DESTINATION_PATH,
+                    log_level=self.config["log-level"],
+                    component_log_level=self.config["component-log-level"],
+                    log_format=self.config["log-format"],
+                    config_hash=hashlib.sha256(
+                        self.envoy_config_template.render_source_template().encode()
+                    ).hexdigest(),
+                    admin_port=int(self.config["admin-port"]),
+                    check_period=self.config["health-check-period"],
+                    check_threshold=self.config["health-check-threshold"],
+                    drain_time=self.config["drain-time"],
+                    drain_strategy=self.config["drain-strategy"],
+                    ingress_drain=self.config["ingress-drain"]
+                    and bool(
+                        self.model.relations["ingress"]
+                        or self.model.relations["istio-ingress-route"]
+                    ),
+                    min_restart_interval=self.config["min-restart-interval"],
                 ),
             ),
-            depends_on=[self.grpc],
+            depends_on=[] if start_before_upstream else [self.grpc],
         )
 
+        for component_item in [
+            self.leadership_gate,
+            self.grpc,
+            self.istio_relations_conflict_detector,
+            self.ingress_relation,
+            self.ambient_ingress,
+            self.envoy_runtime,
+            self.envoy_pebble_container,
+        ]:
+            self.hook_timer.instrument(component_item.component)
+
         self.charm_reconciler.install_default_event_handlers()
+        # Observed after the reconciler, to amend the status it sets
+        self.framework.observe(self.on.update_status, self._on_update_status)
+        self.framework.observe(self.on.get_stats_action, self._on_get_stats_action)
+        self.framework.observe(self.on.profile_action, self._on_profile_action)
+        self.framework.observe(self.on.dump_config_action, self._on_dump_config_action)
+        self.framework.observe(self.on.set_runtime_action, self._on_set_runtime_action)
 
-        admin_port = ServicePort(int(self.model.config["admin-port"]), name="admin")
-        http_port = ServicePort(int(self.model.config["http-port"]), name="http")
-        self.service_patcher = KubernetesServicePatch(self, [admin_port, http_port])
-
-        self.prometheus_provider = MetricsEndpointProvider(
-            charm=self,
-            jobs=[
-                {
-                    "job_name": "envoy_operator_metrics",
-                    "metrics_path": METRICS_PATH,
-                    "static_configs": [{"targets": ["*:{}".format(self.config["admin-port"])]}],
-                }
-            ],
-        )
+        # Each library below is only loaded on the hooks it observes, so other hooks skip both
+        # importing and constructing it.
+        self.service_patcher = None
+        if is_relevant_to_hook(
+            self, hooks=["install", "upgrade-charm", "update-status", "remove", "config-changed"]
+        ):
+            admin_port = ServicePort(int(self.model.config["admin-port"]), name="admin")
+            http_port = ServicePort(
+                int(self.model.config["http-port"]),
+                name="http",
+                # Have the ambient ingress gateway talk HTTP/2 to Envoy for its GRPCRoute
+                appProtocol=(
+                    "kubernetes.io/h2c"
+                    if self.model.config["ambient-ingress-route-type"] == "grpc"
+                    else None
+                ),
+            )
+            with self.hook_timer.measure("KubernetesServicePatch", "init"):
+                self.service_patcher = KubernetesServicePatch(
+                    self,
+                    [admin_port, http_port],
+                    refresh_event=self.on.config_changed,
+                    lightkube_client=self.lightkube_client,
+                )
 
-        self.dashboard_provider = GrafanaDashboardProvider(
+        self.prometheus_provider = None
+        if is_relevant_to_hook(
             self,
-            relation_name="grafana-dashboard",
+            relations=["metrics-endpoint"],
+            hooks=[*LIFECYCLE_HOOKS, f"{self._container_name}-pebble-ready"],
+        ):
+            with self.hook_timer.measure("MetricsEndpointProvider", "init"):
+                self.prometheus_provider = MetricsEndpointProvider(
+                    charm=self,
+                    jobs=[
+                        {
+                            "job_name": "envoy_operator_metrics",
+                            "metrics_path": METRICS_PATH,
+                            "static_configs": [
+                                {"targets": ["*:{}".format(self.config["admin-port"])]}
+                            ],
+                        }
+                    ],
+                )
+
+        self.dashboard_provider = None
+        if is_relevant_to_hook(self, relations=["grafana-dashboard"], hooks=LIFECYCLE_HOOKS):
+            with self.hook_timer.measure("GrafanaDashboardProvider", "init"):
+                self.dashboard_provider = GrafanaDashboardProvider(
+                    self,
+                    relation_name="grafana-dashboard",
+                )
+
+        self._logging = None
+        if is_relevant_to_hook(
+            self,
+            relations=["logging"],
+            hooks=[*LIFECYCLE_HOOKS, f"{self._container_name}-pebble-ready"],
+        ):
+            with self.hook_timer.measure("LogForwarder", "init"):
+                # Only Envoy's logs, not those of helper services such as envoy-deferred-apply
+                self._logging = LogForwarder(
+                    charm=self, services=[self.envoy_pebble_container.component.service_name]
+                )
+
+    def _get_upstream_context(self) -> dict:
+        """Return the template context for the upstream, empty until the grpc relation has data."""
+        service_info = self.grpc.component.get_service_info_if_available()
+        if service_info is None:
+            return {"upstream_service": None, "upstream_port": None}
+        return {"upstream_service": service_info.name, "upstream_port": service_info.port}
+
+    def _on_get_stats_action(self, event: ActionEvent):
+        """Report a summary of Envoy's traffic, connections and latency, see actions.yaml."""
+        try:
+            stats_filter = re.compile(event.params["filter"]) if event.params["filter"] else None
+        except re.error as e:
+            event.fail(f"Invalid filter regex: {e}")
+            return
+
+        admin = EnvoyAdminClient(self.config["admin-port"])
+        try:
+            before = StatsSnapshot.from_json(admin.get_json("/stats", {"format": "json"}))
+            start = time.monotonic()
+            time.sleep(event.params["sample-seconds"])
+            after = StatsSnapshot.from_json(admin.get_json("/stats", {"format": "json"}))
+            elapsed = time.monotonic() - start
+            clusters = admin.get_json("/clusters", {"format": "json"})
+        except EnvoyAdminError as e:
+            event.fail(f"Could not query Envoy's admin interface: {e}")
+            return
+
+        results = summarize(before, after, elapsed, clusters)
+        if stats_filter:
+            results["stats"] = json.dumps(after.matching(stats_filter), indent=2, sort_keys=True)
+        event.set_results(results)
+
+    def _on_profile_action(self, event: ActionEvent):
+        """Profile Envoy's CPU and/or heap usage for a while, see actions.yaml."""
+        if not (event.params["cpu"] or event.params["heap"]):
+            event.fail("Nothing to profile, set at least one of cpu and heap.")
+            return
+        container = self.unit.get_container(self._container_name)
+        if not container.can_connect():
+            event.fail(f"Cannot connect to the {self._container_name} container.")
+            return
+
+        admin = EnvoyAdminClient(self.config["admin-port"])
+        profiler = EnvoyProfiler(container, admin)
+        output_dir = PROFILES_DIR / time.strftime("%Y%m%d-%H%M%S")
+        results = {}
+        try:
+            if event.params["deltas"]:
+                memory_before = admin.get_json("/memory")
+                stats_before = StatsSnapshot.from_json(
+                    admin.get_json("/stats", {"format": "json"})
+                )
+            event.log(f"Profiling Envoy for {event.params['duration']}s")
+            profiler.run(
+                event.params["duration"], cpu=event.params["cpu"], heap=event.params["heap"]
+            )
+            if event.params["deltas"]:
+                memory_after = admin.get_json("/memory")
+                stats_after = StatsSnapshot.from_json(admin.get_json("/stats", {"format": "json"}))
+                results["memory-deltas"] = json.dumps(
+                    memory_deltas(memory_before, memory_after), indent=2
+                )
+                results["stats-deltas"] = json.dumps(
+                    counter_deltas(stats_before, stats_after), indent=2
+                )
+            profiles = profiler.collect(output_dir)
+        except (EnvoyAdminError, PathError) as e:
+            event.fail(f"Could not profile Envoy: {e}")
+            return
+        remove_old_profiles(PROFILES_DIR, keep=PROFILE_RUNS_KEPT)
+
+        results["profiles"] = "\n".join(str(path) for path in profiles)
+        results["retrieve"] = (
+            f"juju scp --container charm {self.unit.name}:{output_dir} <local directory>"
         )
-        self._logging = LogForwarder(charm=self)
+        event.set_results(results)
+
+    def _on_dump_config_action(self, event: ActionEvent):
+        """Compare Envoy's live config with the one rendered from the current context."""
+        admin = EnvoyAdminClient(self.config["admin-port"])
+        try:
+            config_dump = admin.get_json("/config_dump")
+            runtime = admin.get_json("/runtime")
+        except EnvoyAdminError as e:
+            event.fail(f"Could not query Envoy's admin interface: {e}")
+            return
+
+        expected = yaml.safe_load(self.envoy_config_template.render_source_template())
+        live = get_dump_section(config_dump, BOOTSTRAP_DUMP_TYPE).get("bootstrap", {})
+        differences = diff_config(expected, live)
+        if self.config["start-before-upstream"]:
+            expected_clusters = yaml.safe_load(self.envoy_cds_template.render_source_template())
+            differences += diff_config(
+                expected_clusters["resources"], get_live_clusters(config_dump), "clusters"
+            )
+
+        results = {
+            "in-sync": str(not differences).lower(),
+            "differences": json.dumps(
+                [difference.to_dict() for difference in differences], indent=2
+            ),
+            "runtime": json.dumps(
+                {key: entry.get("final_value") for key, entry in runtime["entries"].items()},
+                indent=2,
+                sort_keys=True,
+            ),
+            "warming-clusters": ", ".join(get_warming_clusters(config_dump)),
+        }
+        if event.params["include-dump"]:
+            results["config-dump"] = json.dumps(config_dump, indent=2)
+        event.set_results(results)
+
+    def _on_set_runtime_action(self, event: ActionEvent):
+        """Set Envoy runtime values on this unit, without restarting Envoy, see actions.yaml."""
+        overrides = {}
+        for assignment in event.params["values"].replace(",", " ").split():
+            key, separator, value = assignment.partition("=")
+            if not separator:
+                event.fail(f"Invalid assignment '{assignment}', expected <key>=<value>.")
+                return
+            overrides[key] = value
+
+        if not self.unit.get_container(self._container_name).can_connect():
+            event.fail(f"Cannot connect to the {self._container_name} container.")
+            return
+        runtime = self.envoy_runtime.component
+        try:
+            applied = runtime.set_action_overrides(overrides, reset=event.params["reset"])
+        except RuntimeOverridesError as e:
+            event.fail(str(e))
+            return
+        if not applied:
+            event.fail(f"Could not write Envoy's runtime overrides: {runtime.apply_error}")
+            return
+        event.set_results(
+            {"runtime": json.dumps(runtime.get_overrides(), indent=2, sort_keys=True)}
+        )
+
+    def _on_update_status(self, _):
+        """Add a summary of Envoy's stats to an active unit status, if stats-in-status is set.
+
+        Rates are measured since the previous update-status hook.
+        """
+        if not self.config["stats-in-status"] or not isinstance(self.unit.status, ActiveStatus):
+            return
+
+        admin = EnvoyAdminClient(self.config["admin-port"])
+        try:
+            after = StatsSnapshot.from_json(admin.get_json("/stats", {"format": "json"}))
+            clusters = admin.get_json("/clusters", {"format": "json"})
+        except EnvoyAdminError as e:
+            logger.warning(f"Could not query Envoy's stats for the status: {e}")
+            return
+
+        now = time.time()
+        before = StatsSnapshot(values=dict(self._stored.status_stats), percentiles={})
+        elapsed = now - self._stored.status_stats_time if self._stored.status_stats_time else 0
+        self._stored.status_stats = {
+            counter: after.values[counter]
+            for counter in STATUS_RATE_COUNTERS
+            if counter in after.values
+        }
+        self._stored.status_stats_time = now
+
+        summary = format_status_summary(summarize(before, after, elapsed, clusters))
+        self.unit.status = ActiveStatus(summary)
+
+    def _on_commit(self, _):
+        """Persist the hook timing trace once the hook has finished all its work."""
+        self.hook_timer.write_trace()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import logging
+import re
+from pathlib import PurePosixPath
+from typing import Callable, Dict, Optional
+
+import yaml
+from charmed_kubeflow_chisme.components import Component
+from ops import ActiveStatus, BlockedStatus, StatusBase, StoredState, WaitingStatus
+from ops.pebble import APIError, ChangeError, ExecError, PathError
+
+logger = logging.getLogger(__name__)
+
+# https://www.envoyproxy.io/docs/envoy/latest/configuration/operations/runtime
+RUNTIME_KEY_RE = re.compile(r"^[A-Za-z0-9_-]+(\.[A-Za-z0-9_-]+)*$")
+# Name of the symlink to the current snapshot of the runtime layer, in the runtime directory
+CURRENT_LINK = "current"
+# Subdirectory of a snapshot that holds the runtime files
+SUBDIRECTORY = "envoy"
+
+
+class RuntimeOverridesError(ValueError):
+    """Raised when runtime overrides are invalid."""
+
+
+def parse_runtime_overrides(overrides: Dict[str, object]) -> Dict[str, str]:
+    """Return the runtime overrides as {key: value} strings, raising if one is invalid.
+
+    Raises:
+        RuntimeOverridesError: if a key is not a valid runtime key, a value is not a scalar,
+            or a key is the prefix of another, as keys are stored as nested files.
+    """
+    parsed = {}
+    for key, value in overrides.items():
+        key = str(key)
+        if not RUNTIME_KEY_RE.match(key):
+            raise RuntimeOverridesError(f"Invalid runtime key '{key}'")
+        if isinstance(value, (dict, list)) or value is None:
+            raise RuntimeOverridesError(f"Invalid value for runtime key '{key}'")
+        parsed[key] = str(value).lower() if isinstance(value, bool) else str(value)
+    for key in parsed:
+        if any(other.startswith(f"{key}.") for other in parsed):
+            raise RuntimeOverridesError(f"Runtime key '{key}' is a prefix of another key")
+    return parsed
+
+
+class EnvoyRuntimeComponent(Component):
+    """Writes runtime overrides into the disk layer of Envoy's layered runtime.
+
+    Envoy reloads the disk layer whenever its symlink root is atomically replaced, so the
+    overrides change live, without a restart.  Each set of overrides is written as a
+    snapshot directory named after its hash, and the symlink is then swapped to it:
+
+        <runtime_dir>/current -> <hash>
+        <runtime_dir>/<hash>/envoy/circuit_breakers/metadata-cluster/default/max_requests
+
+    The overrides are those of the config, updated by the set-runtime action.  Those set by
+    the action are kept in StoredState, so they apply to this unit only.
+
+    Args:
+        charm: the charm using this Component
+        name: name of this Component
+        container_name: the workload container running Envoy
+        runtime_dir: directory holding the snapshots and the symlink root of the disk layer
+        config_overrides_getter: returns the overrides of the config, as YAML
+    """
+
+    _stored = StoredState()
+
+    def __init__(
+        self,
+        *args,
+        container_name: str,
+        runtime_dir: PurePosixPath,
+        config_overrides_getter: Callable[[], str],
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.container_name = container_name
+        self.runtime_dir = runtime_dir
+        self._config_overrides_getter = config_overrides_getter
+        self._stored.set_default(action_overrides={}, applied_hash="", apply_error="")
+
+    @property
+    def apply_error(self) -> str:
+        """Why the overrides could not be written the last time, or "" if they were."""
+        return self._stored.apply_error
+
+    @property
+    def symlink_root(self) -> PurePosixPath:
+        """The symlink root of the disk layer, as configured in Envoy's layered runtime."""
+        return self.runtime_dir / CURRENT_LINK
+
+    def _get_config_overrides(self) -> Dict[str, str]:
+        """Return the overrides of the config, raising RuntimeOverridesError if invalid."""
+        try:
+            overrides = yaml.safe_load(self._config_overrides_getter()) or {}
+        except yaml.YAMLError as e:
+            raise RuntimeOverridesError(f"Invalid runtime-overrides YAML: {e}") from e
+        if not isinstance(overrides, dict):
+            raise RuntimeOverridesError("runtime-overrides must be a map of keys to values")
+        return parse_runtime_overrides(overrides)
+
+    def get_overrides(self, action_overrides: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Return the overrides in effect: those of the config, updated by the action.
+
+        Args:
+            action_overrides: the overrides set through the action, the stored ones by default
+        """
+        if action_overrides is None:
+            action_overrides = self._stored.action_overrides
+        overrides = {**self._get_config_overrides(), **action_overrides}
+        # Keys removed through the action are stored with an empty value
+        return parse_runtime_overrides({k: v for k, v in overrides.items() if v != ""})
+
+    def set_action_overrides(self, overrides: Dict[str, str], reset: bool = False) -> bool:
+        """Write the overrides set through the action, and keep them once written.
+
+        Nothing is kept if the overrides are invalid or could not be written, so that a failed
+        action does not take effect in a later hook.
+
+        Args:
+            overrides: {key: value}, where an empty value removes the key, also from those of
+                the config
+            reset: drop the overrides previously set through the action first
+
+        Returns:
+            False if the overrides could not be written, see apply_error.
+
+        Raises:
+            RuntimeOverridesError: if the overrides, or those of the config, are invalid
+        """
+        action_overrides = {} if reset else dict(self._stored.action_overrides)
+        action_overrides.update(overrides)
+        if not self.apply(self.get_overrides(action_overrides)):
+            return False
+        self._stored.action_overrides = action_overrides
+        return True
+
+    @staticmethod
+    def _hash(overrides: Dict[str, str]) -> str:
+        """Return a short hash of overrides, naming their snapshot directory."""
+        return hashlib.sha256(json.dumps(overrides, sort_keys=True).encode()).hexdigest()[:16]
+
+    def _configure_unit(self, event):
+        """Write the overrides into the workload container, unless invalid."""
+        container = self._charm.unit.get_container(self.container_name)
+        if not container.can_connect():
+            logger.info(f"Container {self.container_name} not ready - cannot write runtime.")
+            return
+        # Envoy watches this directory from its start, so it must exist before Envoy does
+        if not container.exists(self.runtime_dir):
+            container.make_dir(self.runtime_dir, make_parents=True)
+        try:
+            overrides = self.get_overrides()
+        except RuntimeOverridesError:
+            return
+        self.apply(overrides)
+
+    def apply(self, overrides: Dict[str, str]) -> bool:
+        """Swap the disk layer to a snapshot of overrides, unless already in effect.
+
+        Without overrides, nothing is written until some were, so a charm that does not use
+        runtime overrides does not exec anything in the workload container.
+
+        Returns:
+            False if the overrides could not be written, see apply_error.
+        """
+        container = self._charm.unit.get_container(self.container_name)
+        overrides_hash = self._hash(overrides)
+        if overrides_hash == self._stored.applied_hash and (
+            not overrides or container.exists(self.runtime_dir / overrides_hash)
+        ):
+            return True
+        if not overrides and not self._stored.applied_hash:
+            self._stored.applied_hash = overrides_hash
+            return True
+
+        snapshot = self.runtime_dir / overrides_hash
+        link = str(self.symlink_root)
+        try:
+            container.make_dir(snapshot / SUBDIRECTORY, make_parents=True)
+            for key, value in overrides.items():
+                path = snapshot / SUBDIRECTORY / PurePosixPath(*key.split("."))
+                container.push(path, value, make_dirs=True)
+            # Replace the symlink with a rename, which Envoy watches for
+            container.exec(["ln", "-sfn", overrides_hash, f"{link}.tmp"]).wait_output()
+            container.exec(["mv", "-Tf", f"{link}.tmp", link]).wait_output()
+        except (APIError, ChangeError, ExecError, PathError) as e:
+            logger.error(f"Could not write Envoy's runtime overrides: {e}")
+            self._stored.apply_error = str(e)
+            return False
+
+        for file in container.list_files(self.runtime_dir):
+            if file.name not in (overrides_hash, CURRENT_LINK):
+                container.remove_path(file.path, recursive=True)
+        logger.info(f"Applied Envoy runtime overrides {overrides_hash}: {sorted(overrides)}")
+        self._stored.applied_hash = overrides_hash
+        self._stored.apply_error = ""
+        return True
+
+    def get_status(self) -> StatusBase:
+        """Return Blocked if the overrides are invalid, or could not be written."""
+        try:
+            overrides = self.get_overrides()
+        except RuntimeOverridesError as e:
+            return BlockedStatus(f"{e}, see the runtime-overrides config option.")
+        if not self._charm.unit.get_container(self.container_name).can_connect():
+            return WaitingStatus("Waiting for Pebble to be ready.")
+        if self._hash(overrides) != self._stored.applied_hash and self._stored.apply_error:
+            return BlockedStatus(
+                f"Could not write Envoy's runtime overrides: {self._stored.apply_error}"
+            )
+        return ActiveStatus()
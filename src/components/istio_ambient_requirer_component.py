@@ -1,22 +1,31 @@
 import logging
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
 
 from charmed_kubeflow_chisme.components import Component
 from charmed_kubeflow_chisme.exceptions import GenericCharmRuntimeError
-from charms.istio_beacon_k8s.v0.service_mesh import ServiceMeshConsumer, UnitPolicy
-from charms.istio_ingress_k8s.v0.istio_ingress_route import (
-    BackendRef,
-    HTTPPathMatch,
-    HTTPRoute,
-    HTTPRouteMatch,
-    IstioIngressRouteConfig,
-    IstioIngressRouteRequirer,
-    Listener,
-    ProtocolType,
+from charms.mlops_libs.v0.k8s_service_info import (
+    KubernetesServiceInfoObject,
+    KubernetesServiceInfoRelationDataMissingError,
+    KubernetesServiceInfoRelationMissingError,
 )
-from ops import ActiveStatus, StatusBase
+from ops import ActiveStatus, BlockedStatus, StatusBase
+
+from deferred_imports import is_relevant_to_hook
+
+if TYPE_CHECKING:
+    from charms.istio_ingress_k8s.v0.istio_ingress_route import IstioIngressRouteConfig
 
 SDI_RELATION = "ingress"
 ISTIO_RELATION = "istio-ingress-route"
+SERVICE_MESH_RELATIONS = [
+    "service-mesh",
+    "require-cmr-mesh",
+    "provide-cmr-mesh",
+    "metrics-endpoint",
+]
+
+# Values of the ambient-ingress-route-type config option
+ROUTE_TYPES = ("http", "grpc")
 
 logger = logging.getLogger(__name__)
 
@@ -28,54 +37,201 @@ class AmbientMeshRequirerComponent(Component):
         self,
         *args,
         path_prefix: str = "/ml_metadata.MetadataStoreService/",
+        grpc_service: str = "ml_metadata.MetadataStoreService",
         relation_name: str = "istio-ingress-route",
+        lightkube_client=None,
+        grpc_service_info_getter: Optional[Callable[[], KubernetesServiceInfoObject]] = None,
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
 
         self.path_prefix = path_prefix
+        self.grpc_service = grpc_service
+        self._relation_name = relation_name
+        # Returns the MLMD service, the backend of the gRPC bypass route
+        self._grpc_service_info_getter = grpc_service_info_getter
 
-        self.ingress = IstioIngressRouteRequirer(
-            self._charm,
-            relation_name=relation_name,
-        )
+        # The istio libraries (and pydantic with them) are only imported on hooks that need them.
+        # The ingress library is used on every reconcile while its relation exists.
+        self.ingress = None
+        if is_relevant_to_hook(self._charm, relations=[relation_name], when_related=True):
+            from charms.istio_ingress_k8s.v0.istio_ingress_route import IstioIngressRouteRequirer
 
-        self._mesh = ServiceMeshConsumer(
-            self._charm, policies=[UnitPolicy(relation="metrics-endpoint")]
-        )
+            self.ingress = IstioIngressRouteRequirer(
+                self._charm,
+                relation_name=relation_name,
+            )
+            self._events_to_observe = [self.ingress.on.ready]
+
+        self._mesh = None
+        if is_relevant_to_hook(
+            self._charm, relations=SERVICE_MESH_RELATIONS, hooks=["install", "upgrade-charm"]
+        ):
+            from charms.istio_beacon_k8s.v0.service_mesh import ServiceMeshConsumer, UnitPolicy
 
-        self._events_to_observe = [self.ingress.on.ready]
+            self._mesh = ServiceMeshConsumer(
+                self._charm, policies=[UnitPolicy(relation="metrics-endpoint")]
+            )
+            if lightkube_client is not None:
+                # Share the charm's client instead of the library building one of its own
+                self._mesh._lightkube_client = lightkube_client
 
     def get_status(self) -> StatusBase:
+        if error := self._get_config_error():
+            return BlockedStatus(error)
         return ActiveStatus()
 
+    def _get_config_error(self) -> Optional[str]:
+        """Return why the ambient ingress config options are invalid, or None if they are valid."""
+        if self._route_type not in ROUTE_TYPES:
+            return (
+                f"Invalid ambient-ingress-route-type '{self._route_type}', must be one of"
+                f" {', '.join(ROUTE_TYPES)}."
+            )
+        if self._grpc_bypass_port and not (
+            0 < self._grpc_bypass_port <= 65535 and self._grpc_bypass_port != 80
+        ):
+            return (
+                f"Invalid ambient-ingress-grpc-bypass-port {self._grpc_bypass_port}, must be a"
+                " port other than 80."
+            )
+        return None
+
+    @property
+    def _route_type(self) -> str:
+        return self.model.config["ambient-ingress-route-type"]
+
+    @property
+    def _grpc_methods(self) -> List[str]:
+        """Return the gRPC methods to route, or an empty list to route all of them."""
+        methods = self.model.config["ambient-ingress-grpc-methods"]
+        return [method.strip() for method in methods.split(",") if method.strip()]
+
     def _configure_app_leader(self, event):
-        if self.ingress.is_ready():
+        if error := self._get_config_error():
+            logger.warning(f"{error} Skipping config submission.")
+            return
+        if self.ingress is not None and self.ingress.is_ready():
             try:
-                self.ingress.submit_config(self._istio_ingress_route_config)
+                config = self._istio_ingress_route_config
+                if self._is_config_submitted(config.model_dump_json()):
+                    logger.debug("Ambient ingress config unchanged, skipping config submission.")
+                    return
+                self.ingress.submit_config(config)
             except Exception as e:
                 raise GenericCharmRuntimeError(f"Failed to submit ingress config: {e}")
         else:
             logger.debug("Ambient ingress relation not ready, skipping config submission.")
 
+    def _is_config_submitted(self, serialized_config: str) -> bool:
+        """Return whether every ingress relation already holds this serialized config.
+
+        Rewriting identical data would still trigger relation-changed on the istio-ingress side.
+        """
+        relations = self.model.relations[self._relation_name]
+        return bool(relations) and all(
+            relation.data[self.model.app].get("config") == serialized_config
+            for relation in relations
+        )
+
     @property
-    def _istio_ingress_route_config(self) -> IstioIngressRouteConfig:
+    def _istio_ingress_route_config(self) -> "IstioIngressRouteConfig":
+        from charms.istio_ingress_k8s.v0.istio_ingress_route import (
+            BackendRef,
+            GRPCRoute,
+            HTTPPathMatch,
+            HTTPRoute,
+            HTTPRouteMatch,
+            IstioIngressRouteConfig,
+            Listener,
+            ProtocolType,
+        )
+
+        backends = [
+            BackendRef(service=self.model.app.name, port=int(self.model.config["http-port"]))
+        ]
+        # Browser clients such as the KFP UI speak gRPC-web, which only the HTTPRoute carries
         http_listener = Listener(port=80, protocol=ProtocolType.HTTP)
+        listeners = [http_listener]
+        http_routes = [
+            HTTPRoute(
+                name="http-ingress",
+                listener=http_listener,
+                matches=[HTTPRouteMatch(path=HTTPPathMatch(value=self.path_prefix))],
+                backends=backends,
+            )
+        ]
+        grpc_routes = []
 
-        return IstioIngressRouteConfig(
-            model=self.model.name,
-            listeners=[http_listener],
-            http_routes=[
-                HTTPRoute(
-                    name="http-ingress",
+        if self._route_type == "grpc":
+            # Native gRPC clients get their own route on the same listener. The gateway speaks
+            # HTTP/2 to them and, as the http port has the h2c app protocol in this mode, to
+            # Envoy as well, which serves gRPC-web over it all the same
+            grpc_routes.append(
+                GRPCRoute(
+                    name="grpc-ingress",
                     listener=http_listener,
-                    matches=[HTTPRouteMatch(path=HTTPPathMatch(value=self.path_prefix))],
-                    backends=[
-                        BackendRef(
-                            service=self.model.app.name,
-                            port=int(self.model.config["http-port"]),
-                        )
-                    ],
+                    matches=self._grpc_route_matches(),
+                    backends=backends,
+                )
+            )
+
+        if bypass_backend := self._grpc_bypass_backend():
+            # Native gRPC clients don't need Envoy's gRPC-web translation, so send them
+            # straight to MLMD on a listener of their own
+            bypass_listener = Listener(port=self._grpc_bypass_port, protocol=ProtocolType.GRPC)
+            listeners.append(bypass_listener)
+            grpc_routes.append(
+                GRPCRoute(
+                    name="grpc-bypass",
+                    listener=bypass_listener,
+                    matches=self._grpc_route_matches(),
+                    backends=[BackendRef(service=bypass_backend[0], port=bypass_backend[1])],
                 )
-            ],
+            )
+
+        return IstioIngressRouteConfig(
+            model=self.model.name,
+            listeners=listeners,
+            http_routes=http_routes,
+            grpc_routes=grpc_routes,
         )
+
+    def _grpc_route_matches(self) -> list:
+        """Return the GRPCRouteMatches for the configured methods of the MLMD service."""
+        from charms.istio_ingress_k8s.v0.istio_ingress_route import (
+            GRPCMethodMatch,
+            GRPCRouteMatch,
+        )
+
+        return [
+            GRPCRouteMatch(method=GRPCMethodMatch(service=self.grpc_service, method=method))
+            for method in self._grpc_methods or [None]
+        ]
+
+    @property
+    def _grpc_bypass_port(self) -> int:
+        return self.model.config["ambient-ingress-grpc-bypass-port"]
+
+    def _grpc_bypass_backend(self) -> Optional[Tuple[str, int]]:
+        """Return the (service, port) of MLMD for the bypass route, or None to not publish it."""
+        if not self._grpc_bypass_port or self._grpc_service_info_getter is None:
+            return None
+        try:
+            service_info = self._grpc_service_info_getter()
+        except (
+            KubernetesServiceInfoRelationDataMissingError,
+            KubernetesServiceInfoRelationMissingError,
+        ):
+            logger.info("MLMD service unknown yet, not publishing the gRPC bypass route.")
+            return None
+
+        # Routes can only point to services in the model's namespace
+        service, _, namespace = service_info.name.partition(".")
+        if namespace and namespace.split(".")[0] != self.model.name:
+            logger.warning(
+                f"MLMD service {service_info.name} is not in namespace {self.model.name},"
+                " not publishing the gRPC bypass route."
+            )
+            return None
+        return service, int(service_info.port)
@@ -45,6 +45,16 @@ class K8sServiceInfoRequirerComponent(Component):
         """Wrap the get_data method and return a KubernetesServiceInfoObject."""
         return self._k8s_service_info_requirer.get_data()
 
+    def get_service_info_if_available(self) -> Optional[KubernetesServiceInfoObject]:
+        """Return the service info, or None if the relation or its data is missing."""
+        try:
+            return self.get_service_info()
+        except (
+            KubernetesServiceInfoRelationMissingError,
+            KubernetesServiceInfoRelationDataMissingError,
+        ):
+            return None
+
     def get_status(self) -> StatusBase:
         """Return this component's status based on the presence of the relation and its data."""
         try:
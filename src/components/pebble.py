@@ -1,7 +1,63 @@
 import dataclasses
+import logging
+import math
+import re
+import shlex
+import time
+from pathlib import Path
+from typing import List, Optional
 
 from charmed_kubeflow_chisme.components import PebbleServiceComponent
-from ops.pebble import Layer
+from charmed_kubeflow_chisme.components.pebble_component import get_event_from_charm
+from ops import ActiveStatus, BlockedStatus, StatusBase, StoredState, WaitingStatus
+from ops.pebble import APIError, ChangeError, CheckStatus, ExecError, Layer, ServiceInfo
+
+from envoy_admin import EnvoyAdminClient, EnvoyAdminError
+
+logger = logging.getLogger(__name__)
+
+# https://www.envoyproxy.io/docs/envoy/latest/operations/cli#cmdoption-l
+ENVOY_LOG_LEVELS = ("trace", "debug", "info", "warning", "warn", "error", "critical", "off")
+# Envoy's own log lines as one JSON object per line, which Loki can parse without a regex.
+# %j is the message escaped for JSON, see
+# https://www.envoyproxy.io/docs/envoy/latest/operations/cli#cmdoption-log-format
+ENVOY_JSON_LOG_FORMAT = (
+    '{"time":"%Y-%m-%dT%T.%e","level":"%l","component":"%n","thread":%t,"message":"%j"}'
+)
+# None keeps Envoy's default, plain text format
+ENVOY_LOG_FORMATS = {"text": None, "json": ENVOY_JSON_LOG_FORMAT}
+
+# Pebble checks against Envoy's admin interface
+READY_CHECK = "envoy-ready"
+ALIVE_CHECK = "envoy-alive"
+# Durations as accepted by Pebble, for example "10s" or "1m30s"
+PEBBLE_DURATION_RE = re.compile(r"(\d+(\.\d+)?(ns|us|µs|ms|s|m|h))+")
+PEBBLE_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ns|us|µs|ms|s|m|h)")
+PEBBLE_DURATION_UNIT_SECONDS = {
+    "ns": 1e-9,
+    "us": 1e-6,
+    "µs": 1e-6,
+    "ms": 1e-3,
+    "s": 1,
+    "m": 60,
+    "h": 3600,
+}
+
+# A new config is pushed next to the live one and checked with `envoy --mode validate` first
+CANDIDATE_CONFIG_SUFFIX = ".candidate"
+VALIDATE_TIMEOUT_SECONDS = 30
+# Longest validation error reported in the unit status
+MAX_VALIDATION_ERROR_LENGTH = 120
+
+# https://www.envoyproxy.io/docs/envoy/latest/operations/cli#cmdoption-drain-strategy
+ENVOY_DRAIN_STRATEGIES = ("gradual", "immediate")
+
+# One-shot Pebble service that wakes the charm up with a custom notice, to apply a restart
+# that was held back by the minimum restart interval once the interval is over
+DEFERRED_APPLY_SERVICE = "envoy-deferred-apply"
+DEFERRED_APPLY_NOTICE = "charmed-kubeflow.io/envoy-deferred-apply"
+# Socket of the Pebble running in a Juju workload container
+WORKLOAD_PEBBLE_SOCKET = "/charm/container/pebble.socket"
 
 
 @dataclasses.dataclass
@@ -9,12 +65,65 @@ class EnvoyPebbleServiceInputs:
     """Defines the required inputs for EnvoyPebbleService."""
 
     config_path: str
+    log_level: str = "info"
+    # Comma separated <component>:<level> pairs, for example "upstream:debug,router:trace"
+    component_log_level: str = ""
+    log_format: str = "text"
+    # Changes whenever the content of the config file changes, so that Envoy is restarted
+    config_hash: str = ""
+    admin_port: int = 9901
+    # Pebble duration, for example "10s"
+    check_period: str = "10s"
+    # Consecutive failures before a check is down, and Envoy restarted for the liveness check
+    check_threshold: int = 3
+    # Seconds to drain connections before a restart or stop, 0 to not drain
+    drain_time: int = 0
+    drain_strategy: str = "gradual"
+    # Whether to report not ready before draining for a restart, so that an ingress stops
+    # sending requests first
+    ingress_drain: bool = False
+    # Minimum seconds between two restarts of a running Envoy, 0 to restart on every change
+    min_restart_interval: int = 0
 
 
 class EnvoyPebbleService(PebbleServiceComponent):
+    """PebbleServiceComponent for Envoy, which only swaps in configs that Envoy accepts.
+
+    A rendered config is first pushed as a candidate and validated by the Envoy binary in the
+    workload container.  If Envoy rejects it, the live config and the Pebble layer are left
+    as they are, so Envoy keeps serving with the last good config instead of crash-looping,
+    and the validation error is reported in the status until a valid config is rendered.
+
+    Before Envoy is restarted for a new layer or stopped with the unit, its connections are
+    drained gracefully for inputs.drain_time seconds.  With inputs.ingress_drain, Envoy first
+    fails its readiness before a restart, for as long as the Pebble ready check takes to go
+    down, so that the pod is unready and an ingress has stopped sending it requests.
+
+    A running Envoy is restarted at most once per inputs.min_restart_interval seconds.  A new
+    layer within that interval is held back, and applied by the first reconcile
+    after it: a later hook, or the Pebble custom notice that a one-shot service in the
+    workload container sends when the interval is over.  A burst of changes, such as churn
+    on the grpc relation, so ends in a single restart with the latest layer.
+    """
+
+    _stored = StoredState()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stored.set_default(
+            validated_config_hash="",
+            rejected_config_hash="",
+            rejected_config_error="",
+            last_restart_time=0.0,
+        )
+        self._events_to_observe.append(
+            get_event_from_charm(self._charm, self.container_name, "pebble_custom_notice")
+        )
+        self.framework.observe(self._charm.on.stop, self._on_stop)
+
     def get_layer(self) -> Layer:
         """Pebble configuration layer for Envoy."""
-        config_path = self._inputs_getter().config_path
+        inputs = self._inputs_getter()
 
         layer = Layer(
             {
@@ -23,10 +132,323 @@ class EnvoyPebbleService(PebbleServiceComponent):
                         "override": "replace",
                         "summary": "envoy service",
                         "startup": "enabled",
-                        "command": ("envoy" " -c" f" {config_path}"),
+                        "command": shlex.join(self._get_command(inputs)),
+                        "environment": {"ENVOY_CONFIG_HASH": inputs.config_hash},
+                        # A hung Envoy is restarted, while one that is not ready yet (for
+                        # example still warming its clusters) is only reported in the status
+                        "on-check-failure": {ALIVE_CHECK: "restart"},
                     }
-                }
+                },
+                "checks": {
+                    READY_CHECK: self._get_http_check(inputs, "ready", "/ready"),
+                    ALIVE_CHECK: self._get_http_check(inputs, "alive", "/server_info"),
+                },
             }
         )
 
         return layer
+
+    def _get_http_check(self, inputs: EnvoyPebbleServiceInputs, level: str, path: str) -> dict:
+        """Return a Pebble check of an endpoint of Envoy's admin interface."""
+        return {
+            "override": "replace",
+            "level": level,
+            "startup": "enabled",
+            "period": inputs.check_period,
+            "threshold": inputs.check_threshold,
+            "http": {"url": f"http://localhost:{inputs.admin_port}{path}"},
+        }
+
+    def _update_layer(self):
+        """Update the Pebble layer, also when only the checks changed."""
+        container = self._charm.unit.get_container(self.container_name)
+        new_layer = self.get_layer()
+
+        current_plan = container.get_plan()
+        restart = any(
+            current_plan.services.get(name) != service
+            for name, service in new_layer.services.items()
+        )
+        if restart or any(
+            current_plan.checks.get(name) != check for name, check in new_layer.checks.items()
+        ):
+            if restart and self._is_running():
+                min_restart_interval = self._inputs_getter().min_restart_interval
+                wait = self._stored.last_restart_time + min_restart_interval - time.time()
+                if wait > 0:
+                    self._defer_restart(wait)
+                    return
+                self._drain(ingress_grace=True)
+            container.add_layer(self.container_name, new_layer, combine=True)
+            container.replan()
+            if restart:
+                self._stored.last_restart_time = time.time()
+
+    def _defer_restart(self, wait: float):
+        """Have Pebble notify the charm once the pending restart can be applied.
+
+        While the helper service waits, any later change is applied by the same restart.  Once
+        it has exited, for example after a notice that came before the interval was over, it
+        is started again for the time left.
+        """
+        wait = math.ceil(wait)
+        logger.info(f"Envoy was restarted recently, restarting it again in {wait}s")
+        if self._is_running(DEFERRED_APPLY_SERVICE):
+            return
+
+        notify = f"sleep {wait} && /charm/bin/pebble notify {DEFERRED_APPLY_NOTICE}"
+        layer = Layer(
+            {
+                "services": {
+                    DEFERRED_APPLY_SERVICE: {
+                        "override": "replace",
+                        "summary": "notify the charm of a pending Envoy restart",
+                        "startup": "disabled",
+                        "command": shlex.join(["sh", "-c", notify]),
+                        "environment": {"PEBBLE_SOCKET": WORKLOAD_PEBBLE_SOCKET},
+                        "on-success": "ignore",
+                        "on-failure": "ignore",
+                    }
+                }
+            }
+        )
+        container = self._charm.unit.get_container(self.container_name)
+        container.add_layer(DEFERRED_APPLY_SERVICE, layer, combine=True)
+        container.restart(DEFERRED_APPLY_SERVICE)
+
+    def _is_running(self, service_name: Optional[str] = None) -> bool:
+        """Return whether the Envoy service, or the given service, is running."""
+        service_name = service_name or self.service_name
+        container = self._charm.unit.get_container(self.container_name)
+        services = container.get_services(service_name)
+        return service_name in services and services[service_name].is_running()
+
+    def _on_stop(self, _):
+        """Drain Envoy before the unit, and with it Envoy, is stopped.
+
+        Kubernetes removes a terminating pod from its service endpoints by itself, so there is
+        no ingress grace period here.
+        """
+        if self.pebble_ready:
+            self._drain(ingress_grace=False)
+
+    @staticmethod
+    def get_ingress_grace_period(inputs: EnvoyPebbleServiceInputs) -> float:
+        """Return how long Envoy fails its readiness before draining for a restart, in seconds.
+
+        This is the longest the Pebble ready check, and with it the readiness of the pod, takes
+        to go down once Envoy fails its /ready endpoint: a check period before the first failed
+        check, then a period for each further failure up to the threshold.
+        """
+        if not inputs.ingress_drain:
+            return 0
+        return pebble_duration_seconds(inputs.check_period) * inputs.check_threshold
+
+    def _drain(self, ingress_grace: bool):
+        """Gracefully drain Envoy's connections if it is running, waiting for the drain to end.
+
+        With ingress_grace, Envoy first fails its /ready endpoint until the readiness of the
+        pod is down, see get_ingress_grace_period, so that an ingress stops sending it new
+        requests.  Envoy then asks clients to close their connections over the drain time,
+        while still serving the requests in flight.
+        """
+        inputs = self._inputs_getter()
+        if inputs.drain_time <= 0 or not self._is_running():
+            return
+
+        grace_period = self.get_ingress_grace_period(inputs) if ingress_grace else 0
+        logger.info(f"Draining Envoy for {grace_period + inputs.drain_time:.0f}s")
+        admin = EnvoyAdminClient(inputs.admin_port)
+        try:
+            if grace_period > 0:
+                admin.post("/healthcheck/fail")
+                time.sleep(grace_period)
+            admin.post("/drain_listeners", {"graceful": None})
+        except EnvoyAdminError as e:
+            logger.warning(f"Could not drain Envoy, restarting it without draining: {e}")
+            return
+        time.sleep(inputs.drain_time)
+
+    @staticmethod
+    def _get_command(inputs: EnvoyPebbleServiceInputs) -> List[str]:
+        """Return the Envoy command line for the given inputs."""
+        command = ["envoy", "-c", str(inputs.config_path), "--log-level", inputs.log_level]
+        if inputs.component_log_level:
+            command += ["--component-log-level", inputs.component_log_level]
+        if log_format := ENVOY_LOG_FORMATS[inputs.log_format]:
+            command += ["--log-format", log_format]
+        if inputs.drain_time > 0:
+            command += ["--drain-time-s", str(inputs.drain_time)]
+            command += ["--drain-strategy", inputs.drain_strategy]
+        return command
+
+    def _get_inputs_error(self) -> Optional[str]:
+        """Return why the inputs cannot be used to run Envoy, or None if they are valid."""
+        inputs = self._inputs_getter()
+        return (
+            self._get_log_inputs_error(inputs)
+            or self._get_check_inputs_error(inputs)
+            or self._get_restart_inputs_error(inputs)
+        )
+
+    @staticmethod
+    def _get_log_inputs_error(inputs: EnvoyPebbleServiceInputs) -> Optional[str]:
+        """Return why the logging inputs are invalid, or None if they are valid."""
+        if inputs.log_level not in ENVOY_LOG_LEVELS:
+            return f"Invalid log-level '{inputs.log_level}'"
+        for component_level in filter(None, inputs.component_log_level.split(",")):
+            _, _, level = component_level.partition(":")
+            if level not in ENVOY_LOG_LEVELS:
+                return f"Invalid component-log-level '{component_level}'"
+        if inputs.log_format not in ENVOY_LOG_FORMATS:
+            return f"Invalid log-format '{inputs.log_format}'"
+        return None
+
+    @staticmethod
+    def _get_check_inputs_error(inputs: EnvoyPebbleServiceInputs) -> Optional[str]:
+        """Return why the health check inputs are invalid, or None if they are valid."""
+        if not PEBBLE_DURATION_RE.fullmatch(inputs.check_period):
+            return f"Invalid health-check-period '{inputs.check_period}'"
+        if inputs.check_threshold < 1:
+            return f"Invalid health-check-threshold {inputs.check_threshold}"
+        return None
+
+    @staticmethod
+    def _get_restart_inputs_error(inputs: EnvoyPebbleServiceInputs) -> Optional[str]:
+        """Return why the drain and restart inputs are invalid, or None if they are valid."""
+        if inputs.drain_time < 0:
+            return f"Invalid drain-time {inputs.drain_time}"
+        if inputs.drain_strategy not in ENVOY_DRAIN_STRATEGIES:
+            return f"Invalid drain-strategy '{inputs.drain_strategy}'"
+        if inputs.min_restart_interval < 0:
+            return f"Invalid min-restart-interval {inputs.min_restart_interval}"
+        return None
+
+    def _configure_unit(self, event):
+        """Configure Envoy, unless its configuration is invalid or rejected by Envoy."""
+        if self._get_inputs_error():
+            return
+        if not self.pebble_ready:
+            logger.info(f"Container {self.container_name} not ready - cannot configure unit.")
+            return
+
+        if self._push_validated_files_to_container():
+            self._update_layer()
+
+    def _push_validated_files_to_container(self) -> bool:
+        """Push the files to the container, validating the Envoy config before swapping it in.
+
+        Returns:
+            False if Envoy rejected the rendered config, which was then not pushed.
+        """
+        inputs = self._inputs_getter()
+        container = self._charm.unit.get_container(self.container_name)
+        for container_file_template in self._files_to_push:
+            push_inputs = container_file_template.get_inputs_for_push()
+            if Path(push_inputs["path"]) == Path(inputs.config_path):
+                if not self._validate_config(inputs.config_hash, push_inputs):
+                    return False
+            container.push(**push_inputs)
+        return True
+
+    def _validate_config(self, config_hash: str, push_inputs: dict) -> bool:
+        """Return whether Envoy accepts the config to push, recording why if it does not.
+
+        The result is kept per config hash, so an unchanged config is not validated again.
+        If the validation cannot run at all, the config is accepted and Envoy reports any
+        error itself, as it did before configs were validated.
+        """
+        if config_hash and config_hash == self._stored.validated_config_hash:
+            return True
+        if config_hash and config_hash == self._stored.rejected_config_hash:
+            return False
+
+        container = self._charm.unit.get_container(self.container_name)
+        candidate_path = f"{push_inputs['path']}{CANDIDATE_CONFIG_SUFFIX}"
+        container.push(**{**push_inputs, "path": candidate_path})
+        try:
+            process = container.exec(
+                ["envoy", "--mode", "validate", "-c", candidate_path],
+                timeout=VALIDATE_TIMEOUT_SECONDS,
+            )
+            process.wait_output()
+        except ExecError as e:
+            error = self._get_validation_error(e)
+            logger.error(f"Envoy rejected the rendered config, not applying it: {error}")
+            self._stored.rejected_config_hash = config_hash
+            self._stored.rejected_config_error = error
+            return False
+        except (APIError, ChangeError, TimeoutError) as e:
+            logger.warning(f"Could not validate the Envoy config, applying it anyway: {e}")
+        else:
+            self._stored.validated_config_hash = config_hash
+        finally:
+            container.remove_path(candidate_path, recursive=True)
+
+        self._stored.rejected_config_hash = ""
+        self._stored.rejected_config_error = ""
+        return True
+
+    @staticmethod
+    def _get_validation_error(error: ExecError) -> str:
+        """Return the last line Envoy printed when rejecting a config, shortened for a status."""
+        lines = [
+            line.strip()
+            for output in (error.stdout, error.stderr)
+            for line in (output or "").splitlines()
+            if line.strip()
+        ]
+        message = lines[-1] if lines else f"exit code {error.exit_code}"
+        if len(message) > MAX_VALIDATION_ERROR_LENGTH:
+            message = message[: MAX_VALIDATION_ERROR_LENGTH - 3] + "..."
+        return message
+
+    def get_services_not_active(self) -> List[ServiceInfo]:
+        """Return the services of get_layer that are not running.
+
+        Unlike PebbleServiceComponent, this leaves out the other services of the plan, such as
+        DEFERRED_APPLY_SERVICE, which is inactive once it has notified the charm.
+        """
+        services = self.get_layer().services
+        return [
+            service for service in super().get_services_not_active() if service.name in services
+        ]
+
+    def get_status(self) -> StatusBase:
+        """Return the status of the service, taking its health checks into account.
+
+        Invalid configuration, or a rendered config that Envoy rejected, is BlockedStatus, and
+        a running Envoy whose checks are down is WaitingStatus until they recover.
+        """
+        if error := self._get_inputs_error():
+            return BlockedStatus(f"{error}, see the config option's description.")
+        inputs = self._inputs_getter()
+        if inputs.config_hash and inputs.config_hash == self._stored.rejected_config_hash:
+            return BlockedStatus(
+                "Envoy rejected the new config, still serving the previous one: "
+                f"{self._stored.rejected_config_error}"
+            )
+        status = super().get_status()
+        if not isinstance(status, ActiveStatus):
+            return status
+
+        container = self._charm.unit.get_container(self.container_name)
+        failing_checks = [
+            check
+            for check in container.get_checks(READY_CHECK, ALIVE_CHECK).values()
+            if check.status == CheckStatus.DOWN
+        ]
+        if failing_checks:
+            details = ", ".join(
+                f"{check.name} ({check.failures} failures)" for check in failing_checks
+            )
+            return WaitingStatus(f"Envoy health checks failing: {details}")
+        return status
+
+
+def pebble_duration_seconds(duration: str) -> float:
+    """Return the seconds of a duration as accepted by Pebble, for example "1m30s"."""
+    return sum(
+        float(value) * PEBBLE_DURATION_UNIT_SECONDS[unit]
+        for value, unit in PEBBLE_DURATION_PART_RE.findall(duration)
+    )
@@ -0,0 +1,27 @@
+import logging
+
+from charmed_kubeflow_chisme.components import SdiRelationBroadcasterComponent
+
+logger = logging.getLogger(__name__)
+
+
+class CachedSdiRelationBroadcasterComponent(SdiRelationBroadcasterComponent):
+    """SdiRelationBroadcasterComponent that only writes relations whose data would change.
+
+    The upstream Component sends data_to_send to every related application on every reconcile,
+    and each write makes the remote charm reconcile again even if nothing changed.  This skips
+    the relations whose databag already holds that data, so that it also holds after a change
+    of leader.
+    """
+
+    def _configure_app_leader(self, event):
+        """Send data to the related applications that did not get this data yet."""
+        interface = self.get_interface()
+        if interface is None:
+            return
+
+        for relation in self.model.relations[self._relation_name]:
+            if interface.unwrap(relation).get(interface.app) == self._data_to_send:
+                logger.debug(f"Data on relation {relation.name}:{relation.id} unchanged")
+                continue
+            interface.wrap(relation, {interface.app: self._data_to_send})
@@ -0,0 +1,145 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""GrafanaDashboardProvider that skips recompressing and republishing unchanged dashboards."""
+
+import hashlib
+import json
+import logging
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from charms.grafana_k8s.v0.grafana_dashboard import (
+    GrafanaDashboardProvider,
+    LZMABase64,
+    _type_convert_stored,
+)
+from ops import HookEvent, Relation
+
+logger = logging.getLogger(__name__)
+
+# Build-time artifact of precompressed dashboards, see tools/precompile_observability.py
+PRECOMPILED_DASHBOARDS_FILE_NAME = ".precompiled"
+
+
+def load_precompiled_dashboards(dashboards_path: str) -> Dict[str, Dict]:
+    """Load the dashboards precompressed at build time, if the charm ships them.
+
+    The artifact maps dashboard ids to the hash of their source file and its compressed
+    content.  Callers must only use an entry while that hash matches the file on disk.
+
+    Returns:
+        A dict of dashboard id to {"source_hash": ..., "content": ...}; empty if there is
+        no usable artifact.
+    """
+    artifact_path = Path(dashboards_path, PRECOMPILED_DASHBOARDS_FILE_NAME)
+    if not artifact_path.is_file():
+        return {}
+    try:
+        artifact = json.loads(artifact_path.read_text())
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning("Ignoring unreadable precompiled dashboards %s: %s", artifact_path, e)
+        return {}
+    if artifact.get("version") != 1:
+        logger.warning("Ignoring precompiled dashboards of unknown version %s", artifact_path)
+        return {}
+    return artifact.get("dashboards", {})
+
+
+class CachedGrafanaDashboardProvider(GrafanaDashboardProvider):
+    """GrafanaDashboardProvider that only does work for dashboards that changed.
+
+    The upstream library LZMA-compresses every dashboard file and rewrites the relation data,
+    with a new uuid that makes Grafana reload every dashboard, on each event it observes.
+    This keeps a hash of each dashboard file and of the settings it is built with instead,
+    reusing the compressed template while the hash matches, or the one precompressed at build
+    time while the file matches it.  The relation is only rewritten when the templates differ
+    from those already published.
+
+    Args:
+        *args, **kwargs: passed to GrafanaDashboardProvider
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Hashes of the sources of the file-based dashboards, keyed like dashboard_templates
+        self._stored.set_default(dashboard_file_hashes={})
+
+    def _update_all_dashboards_from_dir(
+        self, _: Optional[HookEvent] = None, inject_dropdowns: bool = True
+    ) -> None:
+        """Scan the built-in dashboards, recompressing only those that changed."""
+        if not self._dashboards_path:
+            return
+
+        stored_dashboard_templates: Any = self._stored.dashboard_templates
+        stored_file_hashes: Any = self._stored.dashboard_file_hashes
+
+        # Remove the file-based dashboards, so that deleted files are not left behind, but
+        # keep them around to reuse those that did not change
+        previous_file_dashboards = {
+            dashboard_id: stored_dashboard_templates.pop(dashboard_id)
+            for dashboard_id in list(stored_dashboard_templates.keys())
+            if dashboard_id.startswith("file:")
+        }
+        file_hashes = {}
+        precompiled_dashboards = load_precompiled_dashboards(self._dashboards_path)
+
+        for path in Path(self._dashboards_path).glob("*"):
+            if not (path.is_file() and path.name.endswith((".json", ".json.tmpl", ".tmpl"))):
+                continue
+            dashboard_id = "file:{}".format(path.stem)
+            content = path.read_bytes()
+            file_hashes[dashboard_id] = self._dashboard_file_hash(content, inject_dropdowns)
+            if (
+                dashboard_id in previous_file_dashboards
+                and stored_file_hashes.get(dashboard_id) == file_hashes[dashboard_id]
+            ):
+                stored_dashboard_templates[dashboard_id] = previous_file_dashboards[dashboard_id]
+                continue
+
+            precompiled = precompiled_dashboards.get(dashboard_id, {})
+            if precompiled.get("source_hash") == hashlib.sha256(content).hexdigest():
+                compressed = precompiled["content"]
+            else:
+                compressed = LZMABase64.compress(content)
+            stored_dashboard_templates[dashboard_id] = self._content_to_dashboard_object(
+                compressed, inject_dropdowns
+            )
+            stored_dashboard_templates[dashboard_id]["dashboard_alt_uid"] = self._generate_alt_uid(
+                dashboard_id
+            )
+
+        self._stored.dashboard_templates = stored_dashboard_templates
+        self._stored.dashboard_file_hashes = file_hashes
+
+        if self._charm.unit.is_leader():
+            for dashboard_relation in self._charm.model.relations[self._relation_name]:
+                self._upset_dashboards_on_relation(dashboard_relation)
+
+    def _dashboard_file_hash(self, content: bytes, inject_dropdowns: bool) -> str:
+        """Return a hash of everything a file-based dashboard object is built from."""
+        digest = hashlib.sha256(content)
+        settings = {
+            "charm": self._charm.meta.name,
+            "juju_topology": self._juju_topology if inject_dropdowns else {},
+            "inject_dropdowns": inject_dropdowns,
+        }
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _upset_dashboards_on_relation(self, relation: Relation) -> None:
+        """Update the dashboards in the relation data, unless it already carries them."""
+        templates = _type_convert_stored(self._stored.dashboard_templates)
+        try:
+            published = json.loads(relation.data[self._charm.app].get("dashboards", "{}"))
+        except json.JSONDecodeError:
+            published = {}
+        if published.get("templates") == templates:
+            logger.debug("Dashboards on relation %s unchanged, not updating", relation.id)
+            return
+
+        # The uuid makes Grafana notice the change, as in the upstream library
+        relation.data[self._charm.app]["dashboards"] = json.dumps(
+            {"templates": templates, "uuid": str(uuid.uuid4())}
+        )
@@ -0,0 +1,76 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Helpers to defer importing heavy charm libraries until a hook actually needs them."""
+
+import importlib
+import os
+from typing import Any, Iterable, Optional
+
+from ops import CharmBase
+
+
+class DeferredImport:
+    """Stand-in for an object of a module, importing the module only when first used.
+
+    Calling the DeferredImport calls the underlying object, so a deferred class can be
+    instantiated exactly as if it had been imported directly.
+
+    Args:
+        module: dotted path of the module to import
+        name: name of the object in that module
+    """
+
+    def __init__(self, module: str, name: str):
+        self.module = module
+        self.name = name
+        self._object: Any = None
+
+    def load(self) -> Any:
+        """Import the module, returning the object it defines."""
+        if self._object is None:
+            self._object = getattr(importlib.import_module(self.module), self.name)
+        return self._object
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"DeferredImport({self.module}.{self.name})"
+
+
+def dispatched_hook() -> Optional[str]:
+    """Return the name of the hook or action being dispatched, or None if not run by Juju."""
+    dispatch_path = os.environ.get("JUJU_DISPATCH_PATH")
+    if not dispatch_path:
+        return None
+    return os.path.basename(dispatch_path)
+
+
+def is_relevant_to_hook(
+    charm: CharmBase,
+    relations: Iterable[str] = (),
+    hooks: Iterable[str] = (),
+    when_related: bool = False,
+) -> bool:
+    """Return whether the hook being dispatched needs a library handling the given events.
+
+    This errs on the side of loading: outside a Juju dispatch (e.g. in unit tests) the hook is
+    unknown and this always returns True.
+
+    Args:
+        charm: the charm being dispatched
+        relations: names of the relations the library observes.  Any hook of these relations is
+                   relevant.
+        hooks: names of other hooks the library observes, for example `upgrade-charm`
+        when_related: if True, any hook is relevant while one of `relations` exists.  Use this
+                      for libraries that are used by the reconciler on every hook, not only on
+                      their own relation events.
+    """
+    hook = dispatched_hook()
+    if hook is None or hook in hooks:
+        return True
+    if any(hook.startswith(f"{relation}-relation-") for relation in relations):
+        return True
+    if when_related:
+        return any(charm.model.relations[relation] for relation in relations)
+    return False
@@ -0,0 +1,70 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Client of Envoy's admin interface.
+
+Envoy runs in the workload container of the charm's pod, which shares its network namespace
+with the charm container, so the charm reaches the admin interface on localhost.
+"""
+
+import json
+from typing import Any, Optional
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+# Timeout of a single request to the admin interface
+ADMIN_REQUEST_TIMEOUT_SECONDS = 5
+
+
+class EnvoyAdminError(Exception):
+    """Raised when Envoy's admin interface cannot be queried."""
+
+
+class EnvoyAdminClient:
+    """Minimal client of Envoy's admin interface.
+
+    Args:
+        port: port of the admin interface
+        timeout: timeout of each request, in seconds
+    """
+
+    def __init__(self, port: int, timeout: float = ADMIN_REQUEST_TIMEOUT_SECONDS):
+        self.port = int(port)
+        self.timeout = timeout
+
+    def get(self, path: str, params: Optional[dict] = None) -> bytes:
+        """GET an admin endpoint, returning the response body."""
+        return self._request("GET", path, params)
+
+    def get_json(self, path: str, params: Optional[dict] = None) -> Any:
+        """GET an admin endpoint that answers JSON, returning the decoded response."""
+        try:
+            return json.loads(self.get(path, params))
+        except json.JSONDecodeError as e:
+            raise EnvoyAdminError(f"Invalid JSON from {path}: {e}") from e
+
+    def post(self, path: str, params: Optional[dict] = None) -> bytes:
+        """POST to an admin endpoint, returning the response body."""
+        return self._request("POST", path, params)
+
+    def _request(self, method: str, path: str, params: Optional[dict]) -> bytes:
+        """Send a request to the admin interface, raising EnvoyAdminError if it fails.
+
+        Params with a None value are sent as flags without a value, such as `graceful` in
+        `/drain_listeners?graceful`.
+        """
+        url = f"http://localhost:{self.port}{path}"
+        if params:
+            url += "?" + "&".join(
+                key if value is None else urlencode({key: value}) for key, value in params.items()
+            )
+        try:
+            with urlopen(Request(url, method=method), timeout=self.timeout) as response:
+                return response.read()
+        except HTTPError as e:
+            # Envoy explains in the body why it refused, for example a profiler missing in
+            # this build
+            body = e.read().decode(errors="replace").strip()
+            raise EnvoyAdminError(f"{method} {path} failed: {e.code} {body or e.reason}") from e
+        except (URLError, OSError) as e:
+            raise EnvoyAdminError(f"{method} {path} failed: {e}") from e
@@ -0,0 +1,168 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Structural comparison of Envoy's live `/config_dump` with the config the charm rendered.
+
+The live config is what Envoy made of the rendered one, so equivalent spellings are not
+reported as differences: `30.0s` and `30s`, `auto` and `AUTO`, 8080 and "8080", or a
+message and a list of just that message, as Envoy dumps a repeated field given one.  Fields
+that Envoy filled in with defaults are ignored, as only the rendered fields are compared.
+Like any proto3 JSON, the dump leaves out the fields set to their default value, so a
+rendered field missing from the live config only differs if it is not a default.
+"""
+
+import dataclasses
+import re
+from typing import Any, List, Optional
+
+# Proto3 durations, as written in the template or dumped by Envoy
+DURATION_RE = re.compile(r"^(\d+(\.\d+)?)s$")
+# Identifiers such as proto enum values, which Envoy dumps in upper case whatever the case
+# they were given in
+ENUM_RE = re.compile(r"^[A-Z][A-Z0-9_]*$")
+NUMBER_RE = re.compile(r"^-?\d+(\.\d+)?$")
+# Default (zero) values of the enum fields the charm renders, which Envoy leaves out of its
+# dump when set to them, by message path: the path of the field with list items as []
+ENUM_DEFAULTS = {
+    # HttpConnectionManager.codec_type
+    "static_resources.listeners[].filter_chains[].filters[].typed_config.codec_type": "AUTO",
+    # FractionalPercent.denominator of the access log sampling
+    (
+        "static_resources.listeners[].filter_chains[].filters[].typed_config.access_log[]"
+        ".filter.runtime_filter.percent_sampled.denominator"
+    ): "HUNDRED",
+    # Cluster.lb_policy and Cluster.type, of the static and of the CDS clusters
+    "static_resources.clusters[].lb_policy": "ROUND_ROBIN",
+    "static_resources.clusters[].type": "STATIC",
+    "clusters[].lb_policy": "ROUND_ROBIN",
+    "clusters[].type": "STATIC",
+}
+LIST_ITEM_RE = re.compile(r"\[[^\]]*\]")
+
+BOOTSTRAP_DUMP_TYPE = "type.googleapis.com/envoy.admin.v3.BootstrapConfigDump"
+CLUSTERS_DUMP_TYPE = "type.googleapis.com/envoy.admin.v3.ClustersConfigDump"
+
+
+@dataclasses.dataclass
+class ConfigDifference:
+    """A rendered field whose live value differs, or that is missing from the live config."""
+
+    path: str
+    expected: Any
+    # None if the field is missing from the live config
+    live: Any
+
+    def to_dict(self) -> dict:
+        """Return the difference as a JSON serializable dict."""
+        return {"path": self.path, "expected": self.expected, "live": self.live}
+
+
+def _normalize(value: Any) -> Any:
+    """Return a canonical form of a scalar, so that equivalent spellings compare equal."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value)
+    if match := DURATION_RE.match(value):
+        return float(match.group(1))
+    if NUMBER_RE.match(value):
+        return float(value)
+    if ENUM_RE.match(value.upper()):
+        return value.upper()
+    return value
+
+
+def _is_default(path: str, value: Any) -> bool:
+    """Return whether a value is the proto default of a field, which Envoy leaves out."""
+    if value in (None, "", 0, False) or value == [] or value == {}:
+        return True
+    message_path = LIST_ITEM_RE.sub("[]", path)
+    return message_path in ENUM_DEFAULTS and _normalize(value) == ENUM_DEFAULTS[message_path]
+
+
+def _list_key(item: Any) -> Optional[str]:
+    """Return how an item of a list is identified in a path: its name, if it has one."""
+    if isinstance(item, dict) and isinstance(item.get("name"), str):
+        return item["name"]
+    return None
+
+
+def diff_config(expected: Any, live: Any, path: str = "") -> List[ConfigDifference]:
+    """Return the fields of expected whose value differs in live, recursively.
+
+    Items of lists are matched by name when they have one, and by position otherwise.
+
+    Args:
+        expected: the rendered config, or a part of it
+        live: the same part of the live config
+        path: the path of this part, for the returned differences
+    """
+    if isinstance(expected, dict):
+        if isinstance(live, list) and len(live) == 1:
+            # A single message rendered for a repeated field, which Envoy dumps as a list
+            live = live[0]
+        if not isinstance(live, dict):
+            return [ConfigDifference(path or ".", expected, live)]
+        return _diff_dict(expected, live, path)
+    if isinstance(expected, list):
+        if not isinstance(live, list):
+            return [ConfigDifference(path, expected, live)]
+        return _diff_list(expected, live, path)
+    if _normalize(expected) != _normalize(live):
+        return [ConfigDifference(path, expected, live)]
+    return []
+
+
+def _diff_dict(expected: dict, live: dict, path: str) -> List[ConfigDifference]:
+    """Return the differences of the fields of a message, see diff_config."""
+    differences = []
+    for key, value in expected.items():
+        child_path = f"{path}.{key}" if path else key
+        if key in live:
+            differences += diff_config(value, live[key], child_path)
+        elif not _is_default(child_path, value):
+            differences.append(ConfigDifference(child_path, value, None))
+    return differences
+
+
+def _diff_list(expected: list, live: list, path: str) -> List[ConfigDifference]:
+    """Return the differences of the items of a list, see diff_config."""
+    live_by_name = {_list_key(item): item for item in live if _list_key(item) is not None}
+    differences = []
+    for index, item in enumerate(expected):
+        name = _list_key(item)
+        if name is not None:
+            child_path = f"{path}[{name}]"
+            live_item = live_by_name.get(name)
+        else:
+            child_path = f"{path}[{index}]"
+            live_item = live[index] if index < len(live) else None
+        if live_item is None:
+            differences.append(ConfigDifference(child_path, item, None))
+        else:
+            differences += diff_config(item, live_item, child_path)
+    return differences
+
+
+def get_dump_section(config_dump: dict, dump_type: str) -> dict:
+    """Return the section of a `/config_dump` response of the given type, or {}."""
+    for section in config_dump.get("configs", []):
+        if section.get("@type") == dump_type:
+            return section
+    return {}
+
+
+def get_live_clusters(config_dump: dict) -> List[dict]:
+    """Return the active clusters of a `/config_dump` response, static and dynamic."""
+    section = get_dump_section(config_dump, CLUSTERS_DUMP_TYPE)
+    return [
+        cluster["cluster"]
+        for key in ("static_clusters", "dynamic_active_clusters")
+        for cluster in section.get(key, [])
+    ]
+
+
+def get_warming_clusters(config_dump: dict) -> List[str]:
+    """Return the names of the clusters that Envoy is still warming."""
+    section = get_dump_section(config_dump, CLUSTERS_DUMP_TYPE)
+    return [cluster["cluster"]["name"] for cluster in section.get("dynamic_warming_clusters", [])]
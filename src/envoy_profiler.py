@@ -0,0 +1,96 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""On-demand CPU and heap profiling of Envoy, for the profile action.
+
+Envoy's admin interface starts and stops its gperftools profilers, which write their
+profiles into the workload container.  They are then pulled into the charm container.
+"""
+
+import logging
+import shutil
+import time
+from pathlib import Path, PurePosixPath
+from typing import List
+
+from ops import Container
+
+from envoy_admin import EnvoyAdminClient, EnvoyAdminError
+
+logger = logging.getLogger(__name__)
+
+# As set by admin.profile_path in envoy-config.yaml.j2.  The CPU profile is written to this
+# path, and heap profiles to numbered files next to it, such as envoy.prof.0001.heap.
+ENVOY_PROFILE_PATH = PurePosixPath("/tmp/envoy.prof")
+
+
+class EnvoyProfiler:
+    """Runs Envoy's profilers, and collects the profiles they write.
+
+    Args:
+        container: the workload container running Envoy
+        admin: client of Envoy's admin interface
+    """
+
+    def __init__(self, container: Container, admin: EnvoyAdminClient):
+        self._container = container
+        self._admin = admin
+
+    def _profile_files(self) -> List[PurePosixPath]:
+        """Return the profiles currently in the workload container."""
+        return [
+            PurePosixPath(file.path)
+            for file in self._container.list_files(
+                ENVOY_PROFILE_PATH.parent, pattern=f"{ENVOY_PROFILE_PATH.name}*"
+            )
+        ]
+
+    def run(self, duration: float, cpu: bool, heap: bool):
+        """Profile Envoy for duration seconds, removing the profiles of a previous run first.
+
+        The profilers are stopped even if the run is interrupted, as they slow Envoy down.
+
+        Raises:
+            EnvoyAdminError: if a profiler cannot be started, for example because this Envoy
+                build does not include it
+        """
+        for path in self._profile_files():
+            self._container.remove_path(path)
+
+        profilers = [name for name, enabled in (("cpu", cpu), ("heap", heap)) if enabled]
+        started = []
+        try:
+            for profiler in profilers:
+                self._admin.post(f"/{profiler}profiler", {"enable": "y"})
+                started.append(profiler)
+            time.sleep(duration)
+        finally:
+            for profiler in started:
+                try:
+                    self._admin.post(f"/{profiler}profiler", {"enable": "n"})
+                except EnvoyAdminError as e:
+                    logger.error(f"Could not stop Envoy's {profiler} profiler: {e}")
+
+    def collect(self, output_dir: Path) -> List[Path]:
+        """Move the profiles from the workload container into output_dir, returning them."""
+        output_dir.mkdir(parents=True, exist_ok=True)
+        collected = []
+        for path in sorted(self._profile_files()):
+            destination = output_dir / path.name
+            with self._container.pull(path, encoding=None) as source:
+                destination.write_bytes(source.read())
+            self._container.remove_path(path)
+            collected.append(destination)
+        return collected
+
+
+def remove_old_profiles(profiles_dir: Path, keep: int):
+    """Remove all but the latest keep runs from profiles_dir, one directory per run.
+
+    The run directories are named after the time of the run, so sort chronologically.
+    """
+    if not profiles_dir.is_dir():
+        return
+    runs = sorted(path for path in profiles_dir.iterdir() if path.is_dir())
+    for run_dir in runs[: max(len(runs) - keep, 0)]:
+        logger.debug(f"Removing old profiles {run_dir}")
+        shutil.rmtree(run_dir)
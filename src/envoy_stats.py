@@ -0,0 +1,169 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Summaries of Envoy's stats, for first-line performance triage.
+
+The summary covers the proxied HTTP listener (stat prefix `ingress_http`) and the upstream
+cluster (`metadata-cluster`), from `/stats?format=json` and `/clusters?format=json`.
+"""
+
+import dataclasses
+import re
+from typing import Dict, List, Optional
+
+INGRESS_STAT_PREFIX = "http.ingress_http."
+UPSTREAM_CLUSTER = "metadata-cluster"
+UPSTREAM_STAT_PREFIX = f"cluster.{UPSTREAM_CLUSTER}."
+# Latency percentiles reported, which Envoy computes by default
+PERCENTILES = (50, 90, 99)
+# Circuit breaker overflow counters of the upstream cluster, by the name they are reported as
+OVERFLOW_COUNTERS = {
+    "overflow-connections": "upstream_cx_overflow",
+    "overflow-pending-requests": "upstream_rq_pending_overflow",
+    "overflow-retries": "upstream_rq_retry_overflow",
+}
+
+
+@dataclasses.dataclass
+class StatsSnapshot:
+    """Counters, gauges and histogram percentiles from one query of `/stats?format=json`."""
+
+    values: Dict[str, int]
+    # {histogram name: {percentile: cumulative value, None without samples yet}}
+    percentiles: Dict[str, Dict[float, Optional[float]]]
+
+    @classmethod
+    def from_json(cls, stats_json: dict) -> "StatsSnapshot":
+        """Parse the response of `/stats?format=json`."""
+        values = {}
+        percentiles = {}
+        for stat in stats_json.get("stats", []):
+            if "histograms" in stat:
+                histograms = stat["histograms"]
+                supported = histograms.get("supported_quantiles", [])
+                for histogram in histograms.get("computed_quantiles", []):
+                    percentiles[histogram["name"]] = {
+                        float(quantile): value.get("cumulative")
+                        for quantile, value in zip(supported, histogram["values"])
+                    }
+            elif "name" in stat:
+                values[stat["name"]] = stat.get("value", 0)
+        return cls(values=values, percentiles=percentiles)
+
+    def matching(self, pattern: re.Pattern) -> Dict[str, int]:
+        """Return the counters and gauges whose name matches pattern."""
+        return {name: value for name, value in self.values.items() if pattern.search(name)}
+
+
+def _rate(before: StatsSnapshot, after: StatsSnapshot, counter: str, elapsed: float) -> float:
+    """Return the per-second rate of a counter between two snapshots."""
+    if elapsed <= 0:
+        return 0.0
+    delta = after.values.get(counter, 0) - before.values.get(counter, 0)
+    return max(delta, 0) / elapsed
+
+
+def _percentiles(snapshot: StatsSnapshot, histogram: str) -> Dict[str, str]:
+    """Return the reported latency percentiles of a histogram, in milliseconds."""
+    values = snapshot.percentiles.get(histogram, {})
+    percentiles = {}
+    for percentile in PERCENTILES:
+        value = values.get(float(percentile))
+        percentiles[f"p{percentile}-ms"] = "n/a" if value is None else f"{value:g}"
+    return percentiles
+
+
+def _host_health(clusters_json: dict, cluster_name: str) -> Dict[str, str]:
+    """Return the number of hosts, and of healthy hosts, of a cluster from `/clusters`."""
+    hosts: List[dict] = []
+    for cluster in clusters_json.get("cluster_statuses", []):
+        if cluster.get("name") == cluster_name:
+            hosts = cluster.get("host_statuses", [])
+    healthy = [
+        host
+        for host in hosts
+        if all(
+            value == "HEALTHY" if key == "eds_health_status" else not value
+            for key, value in host.get("health_status", {}).items()
+        )
+    ]
+    return {"hosts": str(len(hosts)), "healthy-hosts": str(len(healthy))}
+
+
+def summarize(
+    before: StatsSnapshot, after: StatsSnapshot, elapsed: float, clusters_json: dict
+) -> Dict[str, Dict[str, str]]:
+    """Summarize the traffic of the listener and upstream cluster between two snapshots.
+
+    Rates are measured between the snapshots, while gauges, overflow counters and latency
+    percentiles are those of the later snapshot.  Values are strings, as in action results.
+
+    Args:
+        before: the earlier snapshot
+        after: the later snapshot
+        elapsed: seconds between the snapshots
+        clusters_json: the response of `/clusters?format=json`
+    """
+
+    def value(name: str) -> str:
+        return str(after.values.get(name, 0))
+
+    def rate(counter: str) -> str:
+        return f"{_rate(before, after, counter, elapsed):.2f}"
+
+    ingress = {
+        "rps": rate(f"{INGRESS_STAT_PREFIX}downstream_rq_total"),
+        "active-connections": value(f"{INGRESS_STAT_PREFIX}downstream_cx_active"),
+        "active-requests": value(f"{INGRESS_STAT_PREFIX}downstream_rq_active"),
+        **_percentiles(after, f"{INGRESS_STAT_PREFIX}downstream_rq_time"),
+    }
+    upstream = {
+        "rps": rate(f"{UPSTREAM_STAT_PREFIX}upstream_rq_total"),
+        "active-connections": value(f"{UPSTREAM_STAT_PREFIX}upstream_cx_active"),
+        "active-requests": value(f"{UPSTREAM_STAT_PREFIX}upstream_rq_active"),
+        "pending-requests": value(f"{UPSTREAM_STAT_PREFIX}upstream_rq_pending_active"),
+        **{
+            name: value(f"{UPSTREAM_STAT_PREFIX}{counter}")
+            for name, counter in OVERFLOW_COUNTERS.items()
+        },
+        **_host_health(clusters_json, UPSTREAM_CLUSTER),
+        **_percentiles(after, f"{UPSTREAM_STAT_PREFIX}upstream_rq_time"),
+    }
+    return {"ingress-http": ingress, UPSTREAM_CLUSTER: upstream}
+
+
+def format_status_summary(summary: Dict[str, Dict[str, str]]) -> str:
+    """Return a one-line version of a summary, short enough for a unit status message."""
+    ingress = summary["ingress-http"]
+    upstream = summary[UPSTREAM_CLUSTER]
+    overflow = sum(int(upstream[name]) for name in OVERFLOW_COUNTERS)
+    return (
+        f"{ingress['rps']} rps, {ingress['active-connections']} conns, "
+        f"p50 {ingress['p50-ms']}ms, p99 {ingress['p99-ms']}ms, "
+        f"{upstream['pending-requests']} pending, {overflow} overflows"
+    )
+
+
+def counter_deltas(before: StatsSnapshot, after: StatsSnapshot, limit: int = 50) -> Dict[str, int]:
+    """Return the stats that changed between two snapshots, the largest changes first.
+
+    Args:
+        before: the earlier snapshot
+        after: the later snapshot
+        limit: maximum number of stats returned
+    """
+    deltas = {
+        name: value - before.values.get(name, 0)
+        for name, value in after.values.items()
+        if value != before.values.get(name, 0)
+    }
+    largest = sorted(deltas.items(), key=lambda item: abs(item[1]), reverse=True)[:limit]
+    return dict(largest)
+
+
+def memory_deltas(before_json: dict, after_json: dict) -> Dict[str, int]:
+    """Return the change of each value of `/memory` between two of its responses, in bytes."""
+    return {
+        name: int(after_json[name]) - int(before_json.get(name, 0))
+        for name in after_json
+        if str(after_json[name]).isdigit()
+    }
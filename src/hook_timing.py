@@ -0,0 +1,119 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Opt-in timing instrumentation for profiling where hook execution time is spent."""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+from charmed_kubeflow_chisme.components import Component
+
+logger = logging.getLogger(__name__)
+
+HOOK_TIMING_MODES = ("off", "log", "trace")
+TRACE_FILE_NAME = "hook-timing-trace.json"
+# Number of hooks kept in the trace file, oldest are dropped first
+TRACE_MAX_HOOKS = 50
+
+
+class HookTimer:
+    """Measures the duration of named sections of a hook, emitting them as logs or a trace.
+
+    Modes:
+        off: nothing is measured, measure() and instrument() are no-ops.
+        log: every measurement is logged as a structured (JSON) log line.
+        trace: as `log`, plus all measurements of the hook are appended to a JSON trace file in
+               the charm directory when write_trace() is called.
+
+    Args:
+        mode: one of HOOK_TIMING_MODES
+        trace_dir: directory the trace file is written to, usually the charm directory
+    """
+
+    def __init__(self, mode: str, trace_dir: Optional[Path] = None):
+        if mode not in HOOK_TIMING_MODES:
+            logger.warning(
+                f"Invalid hook-timing mode '{mode}', expected one of {HOOK_TIMING_MODES}."
+                " Hook timing is disabled."
+            )
+            mode = "off"
+        self.mode = mode
+        self.enabled = mode != "off"
+        self.trace_path = Path(trace_dir) / TRACE_FILE_NAME if trace_dir else None
+        self.hook = os.environ.get("JUJU_DISPATCH_PATH", "unknown")
+        self.measurements: List[dict] = []
+        self._hook_start = time.perf_counter()
+
+    @contextmanager
+    def measure(self, name: str, phase: str):
+        """Context manager measuring the wall time of the block it wraps."""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, phase, start, time.perf_counter())
+
+    def instrument(self, component: Component):
+        """Wrap a Component's configure_charm and get_status so each call is measured."""
+        if not self.enabled:
+            return
+
+        configure_charm = component.configure_charm
+        get_status = component.get_status
+
+        def timed_configure_charm(event):
+            with self.measure(component.name, "configure"):
+                return configure_charm(event)
+
+        def timed_get_status():
+            with self.measure(component.name, "status"):
+                return get_status()
+
+        component.configure_charm = timed_configure_charm
+        component.get_status = timed_get_status
+
+    def write_trace(self):
+        """Append this hook's measurements to the trace file, if tracing is enabled."""
+        if self.mode != "trace" or self.trace_path is None:
+            return
+
+        hook_record = {
+            "hook": self.hook,
+            "timestamp": time.time(),
+            "total_ms": _to_ms(time.perf_counter() - self._hook_start),
+            "measurements": self.measurements,
+        }
+        try:
+            hooks = json.loads(self.trace_path.read_text()) if self.trace_path.exists() else []
+        except (OSError, ValueError):
+            logger.warning(f"Discarding unreadable hook timing trace {self.trace_path}")
+            hooks = []
+        hooks = (hooks + [hook_record])[-TRACE_MAX_HOOKS:]
+
+        try:
+            self.trace_path.write_text(json.dumps(hooks))
+        except OSError as err:
+            logger.warning(f"Failed to write hook timing trace {self.trace_path}: {err}")
+
+    def _record(self, name: str, phase: str, start: float, end: float):
+        measurement = {
+            "hook": self.hook,
+            "name": name,
+            "phase": phase,
+            "offset_ms": _to_ms(start - self._hook_start),
+            "duration_ms": _to_ms(end - start),
+        }
+        self.measurements.append(measurement)
+        logger.info(f"hook-timing {json.dumps(measurement)}")
+
+
+def _to_ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
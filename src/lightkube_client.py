@@ -0,0 +1,44 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""A lightkube Client shared by everything in the charm, constructed on first use."""
+
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyLightkubeClient:
+    """Stand-in for a lightkube Client that builds the real Client the first time it is used.
+
+    Building a Client loads the kubeconfig/service account and imports lightkube, so hooks that
+    never talk to Kubernetes should not pay for it.  Every attribute access is forwarded to the
+    underlying Client, so this can be passed anywhere a Client is expected.
+
+    Args:
+        namespace: default namespace of the Client
+        field_manager: field manager used for the Client's write operations
+    """
+
+    def __init__(self, namespace: Optional[str] = None, field_manager: Optional[str] = None):
+        self._namespace = namespace
+        self._field_manager = field_manager
+        self._client = None
+
+    @property
+    def client(self):
+        """Return the underlying lightkube Client, constructing it if needed."""
+        if self._client is None:
+            from lightkube import Client
+
+            logger.debug("Creating lightkube client")
+            self._client = Client(namespace=self._namespace, field_manager=self._field_manager)
+        return self._client
+
+    @property
+    def constructed(self) -> bool:
+        """Return whether the underlying Client has been constructed."""
+        return self._client is not None
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
@@ -0,0 +1,93 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""LogForwarder that forwards only some services and only changes the log targets that differ."""
+
+import logging
+from typing import Dict, List, Optional
+
+from charms.loki_k8s.v1.loki_push_api import LogForwarder, _PebbleLogClient
+from ops import CharmBase, Container, RelationEvent
+from ops.pebble import Layer
+
+logger = logging.getLogger(__name__)
+
+
+class DiffingLogForwarder(LogForwarder):
+    """LogForwarder that forwards the logs of the given Pebble services only.
+
+    The upstream library forwards the logs of every service in the plan, and on every event
+    adds one layer per removed Loki unit plus one for all active units.  This reads the plan
+    once instead, and adds a single layer holding only the log targets that change, or none
+    at all.  Forwarding is also disabled when the last Loki unit goes away, which the upstream
+    library skips.
+
+    Pebble batches the log lines it pushes to Loki itself, so there is no batching to
+    configure here.
+
+    Args:
+        charm: the charm instantiating the LogForwarder
+        services: the Pebble services whose logs are forwarded, to leave out helper services
+        **kwargs: passed to LogForwarder
+    """
+
+    def __init__(self, charm: CharmBase, *, services: List[str], **kwargs):
+        super().__init__(charm, **kwargs)
+        self._services = services
+
+    def _update_logging(self, event: RelationEvent):
+        """Update the log forwarding to match the active Loki endpoints, even if there are none."""
+        loki_endpoints = self._retrieve_endpoints_from_relation()
+        if not loki_endpoints:
+            logger.warning("No Loki endpoints available")
+
+        for container in self._charm.unit.containers.values():
+            if container.can_connect():
+                self._update_endpoints(container, loki_endpoints)
+            # else: `_update_endpoints` will be called on pebble-ready anyway.
+
+        if loki_endpoints:
+            self._handle_alert_rules(event.relation)
+
+    def _build_log_targets(self, loki_endpoints: Dict[str, str], enable: bool) -> Dict:
+        """Build the log targets of the Loki endpoints, forwarding only this charm's services."""
+        targets = _PebbleLogClient._build_log_targets(
+            loki_endpoints=loki_endpoints, topology=self.topology, enable=enable
+        )
+        if enable:
+            for target in targets.values():
+                target["services"] = list(self._services)
+        return targets
+
+    def _update_endpoints(self, container: Container, loki_endpoints: Dict[str, str]):
+        """Make the log targets of the Pebble plan forward to exactly the active endpoints."""
+        current_targets = container.get_plan().to_dict().get("log-targets", {})
+        inactive_endpoints = {
+            unit_name: "(removed)"
+            for unit_name, target in current_targets.items()
+            if unit_name not in loki_endpoints and "-all" not in target.get("services", [])
+        }
+        desired_targets = {
+            **self._build_log_targets(loki_endpoints, enable=True),
+            **self._build_log_targets(inactive_endpoints, enable=False),
+        }
+
+        changed_targets = {
+            unit_name: target
+            for unit_name, target in desired_targets.items()
+            if not _is_same_log_target(current_targets.get(unit_name), target)
+        }
+        if not changed_targets:
+            logger.debug("Log targets of container %s are up to date", container.name)
+            return
+
+        layer = Layer({"log-targets": changed_targets})  # pyright: ignore
+        container.add_layer(f"{container.name}-log-forwarding", layer, combine=True)
+
+
+def _is_same_log_target(current: Optional[Dict], desired: Dict) -> bool:
+    """Return whether a log target of the Pebble plan already matches the desired one."""
+    if current is None:
+        return False
+    return {k: v for k, v in current.items() if k != "override"} == {
+        k: v for k, v in desired.items() if k != "override"
+    }
@@ -0,0 +1,186 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""MetricsEndpointProvider that parses alert rules once and skips unchanged relation writes."""
+
+import hashlib
+import json
+import logging
+import socket
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from charms.prometheus_k8s.v0.prometheus_scrape import MetricsEndpointProvider
+from cosl.rules import AlertRules
+
+logger = logging.getLogger(__name__)
+
+# Build-time artifact of parsed alert rules, see tools/precompile_observability.py
+PRECOMPILED_ALERT_RULES_FILE_NAME = ".precompiled"
+
+# Alert rules as published, per alert rules path, so that they are parsed only once per
+# process: {path: (cache key, rules)}
+_ALERT_RULES_CACHE: Dict[str, Tuple[Tuple, Dict]] = {}
+
+
+def alert_rules_signature(alert_rules_path: str) -> Tuple:
+    """Return the path, mtime and size of every file under alert_rules_path.
+
+    This changes whenever a rules file is added, removed or modified.
+    """
+    path = Path(alert_rules_path)
+    if not path.exists():
+        return ()
+    files = [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+    return tuple((str(file), file.stat().st_mtime_ns, file.stat().st_size) for file in files)
+
+
+def load_precompiled_alert_rules(alert_rules_path: str) -> Dict[str, Dict]:
+    """Load the alert rules parsed at build time, if the charm ships them.
+
+    The artifact maps the path of each rules file, relative to the alert rules directory, to
+    the hash of that file and its parsed content.  Callers must only use an entry while that
+    hash matches the file on disk.
+
+    Returns:
+        A dict of relative path to {"source_hash": ..., "rules": ...}; empty if there is no
+        usable artifact.
+    """
+    artifact_path = Path(alert_rules_path, PRECOMPILED_ALERT_RULES_FILE_NAME)
+    if not artifact_path.is_file():
+        return {}
+    try:
+        artifact = json.loads(artifact_path.read_text())
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning("Ignoring unreadable precompiled alert rules %s: %s", artifact_path, e)
+        return {}
+    if artifact.get("version") != 1:
+        logger.warning("Ignoring precompiled alert rules of unknown version %s", artifact_path)
+        return {}
+    return artifact.get("rule_files", {})
+
+
+def _file_hash(file_path: Path) -> Optional[str]:
+    """Return the sha256 of a file's content, or None if it cannot be read."""
+    try:
+        return hashlib.sha256(file_path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def update_relation_data_if_changed(databag, data: Dict[str, str]) -> None:
+    """Write the keys of data whose value differs from the databag's, skipping the others."""
+    changed = {key: value for key, value in data.items() if databag.get(key) != value}
+    if changed:
+        databag.update(changed)
+
+
+class PrecompiledAlertRules(AlertRules):
+    """AlertRules that takes rules files from a build-time artifact instead of parsing them.
+
+    Files missing from the artifact, or changed since it was built, are read as usual.
+
+    Args:
+        precompiled: rules files as returned by `load_precompiled_alert_rules`
+        *args, **kwargs: passed to AlertRules
+    """
+
+    def __init__(self, *args, precompiled: Optional[Dict[str, Dict]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._precompiled = precompiled or {}
+
+    def _from_file(self, root_path: Path, file_path: Path):
+        entry = self._precompiled.get(file_path.relative_to(root_path).as_posix())
+        if not entry or entry.get("source_hash") != _file_hash(file_path):
+            return super()._from_file(root_path, file_path)
+
+        # Same group naming as AlertRules._from_file
+        rel_path = file_path.parent.relative_to(root_path)
+        rel_path = "" if rel_path == Path(".") else str(rel_path)
+        group_name_parts = [self.topology.identifier] if self.topology else []
+        group_name_parts.append(rel_path)
+        group_name_prefix = "_".join(filter(None, group_name_parts))
+
+        try:
+            return self._from_dict(
+                entry["rules"], group_name=file_path.stem, group_name_prefix=group_name_prefix
+            )
+        except ValueError as e:
+            logger.error("Invalid rules file: %s (%s)", file_path.name, e)
+            return []
+
+
+class CachedMetricsEndpointProvider(MetricsEndpointProvider):
+    """MetricsEndpointProvider that only does work when the scrape data changes.
+
+    The upstream library parses every alert rules file and rewrites all the relation data on
+    each event it observes, which makes Prometheus reload its config each time.  This parses
+    the rules again only when the rules files or the scrape metadata change, taking those
+    parsed at build time while their file matches, and only writes the relation data that
+    differs from the databag.
+
+    Args:
+        *args, **kwargs: passed to MetricsEndpointProvider
+    """
+
+    def set_scrape_job_spec(self, _=None):
+        """Publish the scrape jobs, their metadata and alert rules, where they changed."""
+        self._set_unit_ip()
+
+        if not self._charm.unit.is_leader():
+            return
+
+        # Juju topology is already included in the "scrape_metadata" field.  The consumer
+        # side of the relation uses it to name the rules file written to the filesystem.
+        data = {
+            "scrape_metadata": json.dumps(self._scrape_metadata),
+            "scrape_jobs": json.dumps(self._scrape_jobs),
+            "alert_rules": json.dumps(self._alert_rules_as_dict()),
+        }
+        for relation in self._charm.model.relations[self._relation_name]:
+            update_relation_data_if_changed(relation.data[self._charm.app], data)
+
+    def _alert_rules_as_dict(self) -> dict:
+        """Return the alert rules to publish, parsing the rules files only when they change."""
+        cache_key = (
+            json.dumps(self._scrape_metadata, sort_keys=True),
+            alert_rules_signature(self._alert_rules_path),
+        )
+        cached = _ALERT_RULES_CACHE.get(self._alert_rules_path)
+        if cached and cached[0] == cache_key:
+            return cached[1]
+
+        alert_rules = PrecompiledAlertRules(
+            query_type="promql",
+            topology=self.topology,
+            precompiled=load_precompiled_alert_rules(self._alert_rules_path),
+        )
+        alert_rules.add_path(self._alert_rules_path, recursive=True)
+        alert_rules_as_dict = alert_rules.as_dict()
+        _ALERT_RULES_CACHE[self._alert_rules_path] = (cache_key, alert_rules_as_dict)
+        return alert_rules_as_dict
+
+    def _set_unit_ip(self, _=None):
+        """Publish the address of this unit, where it changed."""
+        for relation in self._charm.model.relations[self._relation_name]:
+            unit_ip = str(self._charm.model.get_binding(relation).network.bind_address)
+
+            if self.external_url:
+                parsed = urlparse(self.external_url)
+                unit_address = parsed.hostname
+                path = parsed.path
+            elif self._is_valid_unit_address(unit_ip):
+                unit_address = unit_ip
+                path = ""
+            else:
+                unit_address = socket.getfqdn()
+                path = ""
+
+            update_relation_data_if_changed(
+                relation.data[self._charm.unit],
+                {
+                    "prometheus_scrape_unit_address": unit_address,
+                    "prometheus_scrape_unit_path": path,
+                    "prometheus_scrape_unit_name": str(self._charm.model.unit.name),
+                },
+            )
@@ -0,0 +1,91 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""KubernetesServicePatch that skips the Kubernetes API when the service is already patched."""
+
+import hashlib
+import json
+import logging
+from typing import List, Optional
+
+from charms.observability_libs.v1.kubernetes_service_patch import KubernetesServicePatch
+from lightkube import ApiError, Client
+from lightkube.core import exceptions
+from lightkube.models.core_v1 import ServicePort
+from lightkube.resources.core_v1 import Service
+from lightkube.types import PatchType
+from ops import CharmBase, StoredState
+
+logger = logging.getLogger(__name__)
+
+
+class CachedKubernetesServicePatch(KubernetesServicePatch):
+    """KubernetesServicePatch that remembers the last applied service spec.
+
+    The upstream library creates a new Client and GETs the Service on every install,
+    update-status and refresh event.  This records a hash of the last successfully applied
+    Service in StoredState instead, making no API calls at all while the spec is unchanged.
+    The cache is dropped on upgrade-charm, where Juju may have recreated the Service.
+
+    Args:
+        charm: the charm that is instantiating the library.
+        ports: a list of ServicePorts
+        lightkube_client: (optional) Client to use for all API calls, for example one shared
+                          with the rest of the charm.  A new Client is created if not given.
+        *args, **kwargs: passed to KubernetesServicePatch
+    """
+
+    _stored = StoredState()
+
+    def __init__(
+        self,
+        charm: CharmBase,
+        ports: List[ServicePort],
+        *args,
+        lightkube_client: Optional[Client] = None,
+        **kwargs,
+    ):
+        super().__init__(charm, ports, *args, **kwargs)
+        self._stored.set_default(applied_service_hash="")
+        self._lightkube_client = lightkube_client
+
+    @property
+    def service_hash(self) -> str:
+        """Return a hash of the Service this patch would apply."""
+        service = self.service.to_dict()  # type: ignore[attr-defined]
+        return hashlib.sha256(json.dumps(service, sort_keys=True).encode()).hexdigest()
+
+    def _patch(self, _) -> None:
+        """Patch the Kubernetes service created by Juju, unless this spec was already applied."""
+        service_hash = self.service_hash
+        if service_hash == self._stored.applied_service_hash:
+            logger.debug("Kubernetes service '%s' already patched, skipping", self.service_name)
+            return
+
+        try:
+            client = self._lightkube_client or Client()  # pyright: ignore
+        except exceptions.ConfigError as e:
+            logger.warning("Error creating k8s client: %s", e)
+            return
+
+        try:
+            if not self._is_patched(client):
+                if self.service_name != self._app:
+                    if not self.service_type == "LoadBalancer":
+                        self._delete_and_create_service(client)
+                    else:
+                        self._create_lb_service(client)
+                client.patch(Service, self.service_name, self.service, patch_type=PatchType.MERGE)
+                logger.info("Kubernetes service '%s' patched successfully", self._app)
+        except ApiError as e:
+            if e.status.code == 403:
+                logger.error("Kubernetes service patch failed: `juju trust` this application.")
+            else:
+                logger.error("Kubernetes service patch failed: %s", str(e))
+            return
+
+        self._stored.applied_service_hash = service_hash
+
+    def _on_upgrade_charm(self, event):
+        """Drop the cached spec before re-applying the patch, as Juju may recreate the service."""
+        self._stored.applied_service_hash = ""
+        super()._on_upgrade_charm(event)
@@ -0,0 +1,313 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Helpers to run Envoy locally against a stand-in MLMD gRPC server and put load on it."""
+
+import dataclasses
+import http.client
+import importlib
+import logging
+import shutil
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent import futures
+from pathlib import Path, PurePosixPath
+from typing import Callable, List, Optional
+from unittest import mock
+
+import grpc
+from grpc_tools import protoc
+from ops.testing import Harness
+
+from charm import GRPC_RELATION_NAME, EnvoyOperator
+
+PROTO_ROOT = Path("tests/integration/data")
+MLMD_SERVICE_PROTO = "metadata_store_service.proto"
+MLMD_METHOD_PATH = "/ml_metadata.MetadataStoreService/GetExecutionTypes"
+
+log = logging.getLogger(__name__)
+
+
+def get_free_port() -> int:
+    """Return a TCP port on localhost that is free at the time of calling."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def render_envoy_config(upstream_port: int, config: Optional[dict] = None) -> str:
+    """Render envoy-config.yaml.j2 through the charm, pointing at a local upstream.
+
+    Args:
+        upstream_port: port of the local MLMD stand-in.
+        config: charm config overrides, applied on top of the defaults in config.yaml.
+    """
+    # Envoy watches the directory holding the runtime symlink root, which must exist
+    runtime_dir = Path(tempfile.gettempdir()) / "envoy-runtime"
+    runtime_dir.mkdir(exist_ok=True)
+    # The charm patches its Kubernetes Service on init, which needs a cluster
+    with mock.patch("charm.KubernetesServicePatch"), mock.patch(
+        "charm.ENVOY_RUNTIME_DIR", PurePosixPath(runtime_dir)
+    ):
+        harness = Harness(EnvoyOperator)
+        try:
+            harness.update_config(config or {})
+            harness.add_relation(
+                GRPC_RELATION_NAME,
+                "mlmd",
+                app_data={"name": "127.0.0.1", "port": str(upstream_port)},
+            )
+            harness.begin()
+            return harness.charm.envoy_config_template.render_source_template()
+        finally:
+            harness.cleanup()
+
+
+def compile_mlmd_protos(output_dir: Path):
+    """Compile the MLMD service protos into output_dir, returning the (pb2, pb2_grpc) modules."""
+    well_known_protos = Path(protoc.__file__).parent / "_proto"
+    result = protoc.main(
+        [
+            "grpc_tools.protoc",
+            f"-I{PROTO_ROOT}",
+            f"-I{well_known_protos}",
+            f"--python_out={output_dir}",
+            f"--grpc_python_out={output_dir}",
+            str(PROTO_ROOT / MLMD_SERVICE_PROTO),
+            str(PROTO_ROOT / "ml_metadata/proto/metadata_store.proto"),
+        ]
+    )
+    if result != 0:
+        raise RuntimeError(f"protoc failed to compile the MLMD protos (exit code {result})")
+
+    sys.path.insert(0, str(output_dir))
+    pb2 = importlib.import_module("metadata_store_service_pb2")
+    pb2_grpc = importlib.import_module("metadata_store_service_pb2_grpc")
+    return pb2, pb2_grpc
+
+
+def start_fake_mlmd_server(pb2, pb2_grpc, max_workers: int = 32):
+    """Start a MetadataStoreService stand-in on localhost, returning (server, port).
+
+    Only GetExecutionTypes is implemented, answering immediately with an empty response, so
+    that the measured latency is dominated by Envoy rather than by the upstream.
+    """
+
+    class FakeMetadataStoreService(pb2_grpc.MetadataStoreServiceServicer):
+        def GetExecutionTypes(self, request, context):  # noqa: N802
+            return pb2.GetExecutionTypesResponse()
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    pb2_grpc.add_MetadataStoreServiceServicer_to_server(FakeMetadataStoreService(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server, port
+
+
+def find_envoy_binary(envoy_binary: Optional[str] = None) -> Optional[str]:
+    """Return the path to the envoy binary, or None if it is not available locally."""
+    return shutil.which(envoy_binary or "envoy")
+
+
+class EnvoyProcess:
+    """A local Envoy process running a rendered configuration."""
+
+    def __init__(self, envoy_binary: str, config_path: Path, admin_port: int):
+        self.envoy_binary = envoy_binary
+        self.config_path = config_path
+        self.admin_port = admin_port
+        self._process: Optional[subprocess.Popen] = None
+
+    def start(self, timeout: float = 30):
+        """Start Envoy and block until its admin /ready endpoint reports LIVE."""
+        self._process = subprocess.Popen(
+            [
+                self.envoy_binary,
+                "-c",
+                str(self.config_path),
+                # Avoid clashing with any other Envoy using the default shared memory region
+                "--base-id",
+                str(self.admin_port),
+                "--log-level",
+                "warn",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                stderr = self._process.stderr.read().decode()
+                raise RuntimeError(f"Envoy exited during startup: {stderr}")
+            try:
+                with urllib.request.urlopen(
+                    f"http://127.0.0.1:{self.admin_port}/ready", timeout=1
+                ) as response:
+                    if response.read().strip() == b"LIVE":
+                        return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise TimeoutError(f"Envoy was not ready after {timeout}s")
+
+    def stop(self):
+        """Stop Envoy if it is running."""
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            self._process.wait(timeout=10)
+        self._process = None
+
+
+@dataclasses.dataclass
+class LoadResult:
+    """Summary of a load run."""
+
+    protocol: str
+    concurrency: int
+    duration_s: float
+    requests: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+    @property
+    def rps(self) -> float:
+        """Successful requests per second over the run."""
+        return self.requests / self.duration_s if self.duration_s else 0.0
+
+    def summary(self) -> str:
+        """Return a single line, human-readable summary of this result."""
+        return (
+            f"{self.protocol} concurrency={self.concurrency} rps={self.rps:.1f}"
+            f" p50={self.p50_ms:.2f}ms p95={self.p95_ms:.2f}ms p99={self.p99_ms:.2f}ms"
+            f" requests={self.requests} errors={self.errors}"
+        )
+
+    def as_dict(self) -> dict:
+        """Return this result as a dict, including the derived rps."""
+        return {**dataclasses.asdict(self), "rps": self.rps}
+
+
+def _percentiles(latencies: List[float]):
+    """Return the p50, p95 and p99 of a list of latencies given in seconds, in milliseconds."""
+    if len(latencies) < 2:
+        value = latencies[0] * 1000 if latencies else 0.0
+        return value, value, value
+    cut_points = statistics.quantiles(latencies, n=100, method="inclusive")
+    return cut_points[49] * 1000, cut_points[94] * 1000, cut_points[98] * 1000
+
+
+def run_load(
+    protocol: str,
+    make_request: Callable[[], Callable[[], None]],
+    concurrency: int,
+    duration_s: float,
+) -> LoadResult:
+    """Drive closed-loop load with `concurrency` workers for `duration_s` seconds.
+
+    Args:
+        protocol: label for the result.
+        make_request: called once per worker, returning the function that worker calls for each
+                      request.  This lets every worker hold its own connection.  The request
+                      function should raise on any failure.
+        concurrency: number of concurrent workers, each with one request in flight.
+        duration_s: how long to drive load for.
+    """
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration_s
+
+    def worker():
+        nonlocal errors
+        request = make_request()
+        local_latencies = []
+        local_errors = 0
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                request()
+            except Exception:
+                local_errors += 1
+                continue
+            local_latencies.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    p50, p95, p99 = _percentiles(latencies)
+    return LoadResult(
+        protocol=protocol,
+        concurrency=concurrency,
+        duration_s=elapsed,
+        requests=len(latencies),
+        errors=errors,
+        p50_ms=p50,
+        p95_ms=p95,
+        p99_ms=p99,
+    )
+
+
+def grpc_request_factory(pb2, pb2_grpc, target: str) -> Callable[[], Callable[[], None]]:
+    """Return a factory of native gRPC GetExecutionTypes callers, one channel per worker."""
+
+    def make_request():
+        channel = grpc.insecure_channel(target)
+        stub = pb2_grpc.MetadataStoreServiceStub(channel)
+        request = pb2.GetExecutionTypesRequest()
+
+        def call():
+            stub.GetExecutionTypes(request, timeout=10)
+
+        return call
+
+    return make_request
+
+
+def grpc_web_request_factory(pb2, host: str, port: int) -> Callable[[], Callable[[], None]]:
+    """Return a factory of gRPC-web GetExecutionTypes callers, one connection per worker."""
+    message = pb2.GetExecutionTypesRequest().SerializeToString()
+    # gRPC-web framing: 1 byte flags (0 = data frame), 4 bytes big-endian length, message
+    body = struct.pack(">BI", 0, len(message)) + message
+    headers = {
+        "Content-Type": "application/grpc-web+proto",
+        "X-Grpc-Web": "1",
+        "Accept": "application/grpc-web+proto",
+    }
+
+    def make_request():
+        connection = http.client.HTTPConnection(host, port, timeout=10)
+
+        def call():
+            connection.request("POST", MLMD_METHOD_PATH, body=body, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+            grpc_status = response.getheader("grpc-status")
+            if grpc_status is None:
+                # On success, grpc-status is sent in the trailer frame within the body
+                grpc_status = "0" if b"grpc-status:0" in payload.replace(b" ", b"") else None
+            if response.status != 200 or grpc_status != "0":
+                raise RuntimeError(
+                    f"gRPC-web request failed: http={response.status} grpc-status={grpc_status}"
+                )
+
+        return call
+
+    return make_request
@@ -0,0 +1,126 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Load benchmark of the rendered Envoy configuration.
+
+Envoy is run locally with the charm's rendered envoy-config.yaml.j2, in front of a stand-in
+MetadataStoreService gRPC server, and driven with native gRPC and gRPC-web load.  Results are
+logged and, if ENVOY_BENCHMARK_REPORT is set, written to that path as JSON.
+
+Tunables (environment variables):
+* ENVOY_BINARY: envoy binary to run (default: `envoy` from PATH).  Tests skip if not found.
+* ENVOY_BENCHMARK_DURATION: seconds of load per case (default: 10).
+* ENVOY_BENCHMARK_CONCURRENCY: comma separated concurrency levels (default: 1,8,32).
+* ENVOY_BENCHMARK_MIN_RPS: fail any case with a lower throughput (default: no threshold).
+* ENVOY_BENCHMARK_MAX_P99_MS: fail any case with a higher p99 latency (default: no threshold).
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+
+import pytest
+from envoy_harness import (
+    EnvoyProcess,
+    compile_mlmd_protos,
+    find_envoy_binary,
+    get_free_port,
+    grpc_request_factory,
+    grpc_web_request_factory,
+    render_envoy_config,
+    run_load,
+    start_fake_mlmd_server,
+)
+
+DURATION_S = float(os.environ.get("ENVOY_BENCHMARK_DURATION", "10"))
+CONCURRENCY_LEVELS = [
+    int(level) for level in os.environ.get("ENVOY_BENCHMARK_CONCURRENCY", "1,8,32").split(",")
+]
+MIN_RPS = float(os.environ.get("ENVOY_BENCHMARK_MIN_RPS", "0"))
+MAX_P99_MS = float(os.environ.get("ENVOY_BENCHMARK_MAX_P99_MS", "inf"))
+REPORT_PATH = os.environ.get("ENVOY_BENCHMARK_REPORT")
+
+log = logging.getLogger(__name__)
+results = []
+
+
+@pytest.fixture(scope="module")
+def envoy_binary() -> str:
+    envoy_binary = find_envoy_binary(os.environ.get("ENVOY_BINARY"))
+    if envoy_binary is None:
+        pytest.skip("envoy binary not found; set ENVOY_BINARY or add envoy to PATH")
+    return envoy_binary
+
+
+@pytest.fixture(scope="module")
+def mlmd_protos(tmp_path_factory):
+    return compile_mlmd_protos(tmp_path_factory.mktemp("mlmd_protos"))
+
+
+@pytest.fixture(scope="module")
+def fake_mlmd(mlmd_protos):
+    pb2, pb2_grpc = mlmd_protos
+    server, port = start_fake_mlmd_server(pb2, pb2_grpc, max_workers=max(CONCURRENCY_LEVELS))
+    yield port
+    server.stop(grace=None)
+
+
+@pytest.fixture(scope="module")
+def envoy(envoy_binary, fake_mlmd, tmp_path_factory):
+    """Envoy rendered with the default charm config, proxying to the stand-in MLMD server."""
+    admin_port = get_free_port()
+    http_port = get_free_port()
+    config_path = Path(tmp_path_factory.mktemp("envoy")) / "envoy-config.yaml"
+    config_path.write_text(
+        render_envoy_config(
+            upstream_port=fake_mlmd,
+            config={"admin-port": str(admin_port), "http-port": str(http_port)},
+        )
+    )
+
+    process = EnvoyProcess(envoy_binary, config_path, admin_port)
+    process.start()
+    yield http_port
+    process.stop()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def report():
+    yield
+    if REPORT_PATH:
+        Path(REPORT_PATH).write_text(json.dumps([r.as_dict() for r in results], indent=2))
+
+
+def assert_within_budget(result):
+    log.info(result.summary())
+    results.append(result)
+    assert result.requests > 0, f"No successful requests: {result.summary()}"
+    assert result.errors == 0, f"Requests failed: {result.summary()}"
+    assert result.rps >= MIN_RPS, f"Throughput below {MIN_RPS} rps: {result.summary()}"
+    assert result.p99_ms <= MAX_P99_MS, f"p99 above {MAX_P99_MS}ms: {result.summary()}"
+
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY_LEVELS)
+def test_grpc_load(envoy, mlmd_protos, concurrency):
+    """Native gRPC (HTTP/2) clients through Envoy to the upstream."""
+    pb2, pb2_grpc = mlmd_protos
+    result = run_load(
+        protocol="grpc",
+        make_request=grpc_request_factory(pb2, pb2_grpc, f"127.0.0.1:{envoy}"),
+        concurrency=concurrency,
+        duration_s=DURATION_S,
+    )
+    assert_within_budget(result)
+
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY_LEVELS)
+def test_grpc_web_load(envoy, mlmd_protos, concurrency):
+    """gRPC-web (HTTP/1.1) clients, translated to gRPC by Envoy."""
+    pb2, _ = mlmd_protos
+    result = run_load(
+        protocol="grpc-web",
+        make_request=grpc_web_request_factory(pb2, "127.0.0.1", envoy),
+        concurrency=concurrency,
+        duration_s=DURATION_S,
+    )
+    assert_within_budget(result)
@@ -0,0 +1,31 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import pytest
+from ops.testing import Harness
+
+from charm import EnvoyOperator
+
+
+@pytest.fixture()
+def mocked_kubernetes_service_patch(mocker):
+    """Mocks the KubernetesServicePatch for the charm."""
+    return mocker.patch("charm.KubernetesServicePatch")
+
+
+@pytest.fixture()
+def unstarted_harness(mocked_kubernetes_service_patch) -> Harness:
+    """Harness of the charm before begin, for tests that set up what the charm starts with."""
+    harness = Harness(EnvoyOperator)
+    harness.set_model_name("kubeflow")
+    yield harness
+    harness.cleanup()
+
+
+@pytest.fixture()
+def harness(unstarted_harness) -> Harness:
+    """Harness populated with the Charm and with its KubernetesServicePatch patched.
+
+    Modules override this fixture, requesting it, to add the relations or config they need.
+    """
+    unstarted_harness.begin()
+    return unstarted_harness
@@ -1,11 +1,14 @@
 # Copyright 2024 Canonical Ltd.
 # See LICENSE file for licensing details.
+import json
 from unittest.mock import MagicMock, patch
 
 import pytest
 from ops import BlockedStatus
 from ops.model import ActiveStatus, TooManyRelatedAppsError, WaitingStatus
-from ops.testing import Harness
+from ops.pebble import CheckInfo, CheckLevel, CheckStatus
+from ops.testing import ExecResult, Harness
+from serialized_data_interface import SerializedDataInterface
 
 from charm import GRPC_RELATION_NAME, EnvoyOperator
 
@@ -18,6 +21,7 @@ def harness(mocked_kubernetes_service_patch) -> Harness:
     harness = Harness(EnvoyOperator)
     harness.set_leader(True)
     harness.set_model_name("maybe-kubeflow")
+    harness.handle_exec("envoy", ["envoy", "--mode", "validate"], result=0)
     return harness
 
 
@@ -25,7 +29,7 @@ def harness(mocked_kubernetes_service_patch) -> Harness:
 def mocked_kubernetes_service_patch(mocker):
     """Mocks the KubernetesServicePatch for the charm."""
     mocked_kubernetes_service_patch = mocker.patch(
-        "charm.KubernetesServicePatch", lambda x, y: None
+        "charm.KubernetesServicePatch", lambda *args, **kwargs: None
     )
     yield mocked_kubernetes_service_patch
 
@@ -34,7 +38,7 @@ class TestCharm:
     def test_log_forwarding(self, harness: Harness):
         with patch("charm.LogForwarder") as mock_logging:
             harness.begin()
-            mock_logging.assert_called_once_with(charm=harness.charm)
+            mock_logging.assert_called_once_with(charm=harness.charm, services=["envoy"])
 
     def test_not_leader(self, harness):
         """Test that the charm is not active when not leader."""
@@ -67,6 +71,88 @@ class TestCharm:
         )
         assert isinstance(harness.charm.model.unit.status, BlockedStatus)
 
+    def test_ambient_ingress_config_submitted_only_when_changed(self, harness: Harness):
+        """Test the istio-ingress-route config is not rewritten while unchanged."""
+        rel_id = harness.add_relation("istio-ingress-route", "istio-ingress-k8s")
+        harness.begin()
+        component = harness.charm.ambient_ingress.component
+
+        with patch.object(
+            component.ingress, "submit_config", wraps=component.ingress.submit_config
+        ) as submit_config:
+            component._configure_app_leader(None)
+            component._configure_app_leader(None)
+            assert submit_config.call_count == 1
+
+            harness.update_config({"http-port": "8888"})
+            component._configure_app_leader(None)
+            assert submit_config.call_count == 2
+
+        assert '"port":8888' in harness.get_relation_data(rel_id, "envoy")["config"]
+
+    def test_ambient_ingress_grpc_route(self, harness: Harness):
+        """Test the grpc route type adds a GRPCRoute per MLMD method to the HTTPRoute."""
+        rel_id = harness.add_relation("istio-ingress-route", "istio-ingress-k8s")
+        harness.update_config(
+            {
+                "ambient-ingress-route-type": "grpc",
+                "ambient-ingress-grpc-methods": "GetArtifacts, GetExecutions",
+            }
+        )
+        harness.begin()
+
+        harness.charm.ambient_ingress.component._configure_app_leader(None)
+
+        config = json.loads(harness.get_relation_data(rel_id, "envoy")["config"])
+        assert config["listeners"] == [{"port": 80, "protocol": "HTTP"}]
+        # gRPC-web clients keep their route
+        (http_route,) = config["http_routes"]
+        assert http_route["listener"] == {"port": 80, "protocol": "HTTP"}
+        (route,) = config["grpc_routes"]
+        assert route["listener"] == {"port": 80, "protocol": "HTTP"}
+        assert [match["method"] for match in route["matches"]] == [
+            {"service": "ml_metadata.MetadataStoreService", "method": "GetArtifacts"},
+            {"service": "ml_metadata.MetadataStoreService", "method": "GetExecutions"},
+        ]
+
+    @pytest.mark.parametrize(
+        "grpc_data, bypass_backend",
+        [
+            ({"name": "metadata-grpc-service", "port": "8080"}, ("metadata-grpc-service", 8080)),
+            ({"name": "mlmd.maybe-kubeflow.svc.cluster.local", "port": "8080"}, ("mlmd", 8080)),
+            ({"name": "mlmd.other-model.svc.cluster.local", "port": "8080"}, None),
+        ],
+    )
+    def test_ambient_ingress_grpc_bypass_route(self, harness: Harness, grpc_data, bypass_backend):
+        """Test the bypass route sends native gRPC to MLMD when it is in the same namespace."""
+        rel_id = harness.add_relation("istio-ingress-route", "istio-ingress-k8s")
+        harness.add_relation(GRPC_RELATION_NAME, "mlmd", app_data=grpc_data)
+        harness.update_config({"ambient-ingress-grpc-bypass-port": 9090})
+        harness.begin()
+
+        harness.charm.ambient_ingress.component._configure_app_leader(None)
+
+        config = json.loads(harness.get_relation_data(rel_id, "envoy")["config"])
+        assert config["http_routes"][0]["backends"][0]["service"] == "envoy"
+        if bypass_backend is None:
+            assert config["grpc_routes"] == []
+            return
+        (route,) = config["grpc_routes"]
+        assert route["listener"] == {"port": 9090, "protocol": "GRPC"}
+        backend = route["backends"][0]
+        assert (backend["service"], backend["port"]) == bypass_backend
+
+    def test_ambient_ingress_invalid_route_type(self, harness: Harness):
+        """Test an invalid route type blocks the ambient ingress component."""
+        rel_id = harness.add_relation("istio-ingress-route", "istio-ingress-k8s")
+        harness.update_config({"ambient-ingress-route-type": "tcp"})
+        harness.begin()
+
+        harness.charm.ambient_ingress.component._configure_app_leader(None)
+
+        assert isinstance(harness.charm.ambient_ingress.component.get_status(), BlockedStatus)
+        assert "config" not in harness.get_relation_data(rel_id, "envoy")
+
     def test_many_relations(self, harness: Harness):
         """Test the grpc component and charm are not active when >1 grpc relation is present."""
 
@@ -136,6 +222,27 @@ class TestCharm:
 
         assert harness.charm.ingress_relation.status == ActiveStatus()
 
+    def test_ingress_data_sent_only_when_changed(self, harness: Harness):
+        """Test the SDI ingress data is only rewritten when the payload changes."""
+        rel_id = setup_ingress_relation(harness)
+        harness.begin()
+        component = harness.charm.ingress_relation.component
+
+        with patch(
+            "serialized_data_interface.SerializedDataInterface.wrap",
+            autospec=True,
+            side_effect=SerializedDataInterface.wrap,
+        ) as wrap:
+            component._configure_app_leader(None)
+            component._configure_app_leader(None)
+            assert wrap.call_count == 1
+
+            component._data_to_send["port"] = 8888
+            component._configure_app_leader(None)
+            assert wrap.call_count == 2
+
+        assert "8888" in harness.get_relation_data(rel_id, "envoy")["data"]
+
     def test_pebble_container(self, harness: Harness):
         """Test the pebble container is active when prerequisites are ready."""
         setup_grpc_relation(harness, "grpc-one", "8080")
@@ -146,6 +253,273 @@ class TestCharm:
         container = harness.model.unit.get_container("envoy")
         assert container.get_service("envoy")
 
+    def test_envoy_log_options(self, harness: Harness):
+        """Test the log config options are passed to Envoy's command line."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        harness.update_config(
+            {"log-level": "warning", "component-log-level": "upstream:debug", "log-format": "json"}
+        )
+
+        harness.begin_with_initial_hooks()
+
+        command = harness.get_container_pebble_plan("envoy").services["envoy"].command
+        assert "--log-level warning" in command
+        assert "--component-log-level upstream:debug" in command
+        assert '"level":"%l"' in command
+
+    def test_envoy_health_checks(self, harness: Harness):
+        """Test Envoy's admin endpoints are checked, and a failing liveness check restarts it."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        harness.update_config({"health-check-period": "5s", "health-check-threshold": 2})
+
+        harness.begin_with_initial_hooks()
+
+        plan = harness.get_container_pebble_plan("envoy")
+        assert plan.services["envoy"].on_check_failure == {"envoy-alive": "restart"}
+        assert plan.checks["envoy-ready"].http == {"url": "http://localhost:9901/ready"}
+        assert plan.checks["envoy-alive"].http == {"url": "http://localhost:9901/server_info"}
+        assert plan.checks["envoy-alive"].level == CheckLevel.ALIVE
+        assert plan.checks["envoy-ready"].period == "5s"
+        assert plan.checks["envoy-ready"].threshold == 2
+
+    def test_unchanged_layer_is_not_added_again(self, harness: Harness):
+        """Test reconciling an unchanged configuration does not touch the Pebble plan."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        harness.begin_with_initial_hooks()
+        container = harness.charm.unit.get_container("envoy")
+
+        with patch.object(container, "add_layer") as add_layer:
+            harness.charm.envoy_pebble_container.component._update_layer()
+
+        add_layer.assert_not_called()
+
+    def test_failing_health_check_is_reported(self, harness: Harness):
+        """Test the Envoy component waits while a health check is down."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        harness.begin_with_initial_hooks()
+        failing_check = CheckInfo(
+            "envoy-ready", CheckLevel.READY, CheckStatus.DOWN, failures=3, threshold=3
+        )
+
+        with patch.object(
+            harness.charm.unit.get_container("envoy"),
+            "get_checks",
+            return_value={"envoy-ready": failing_check},
+        ):
+            status = harness.charm.envoy_pebble_container.component.get_status()
+
+        assert isinstance(status, WaitingStatus)
+        assert "envoy-ready (3 failures)" in status.message
+
+    def test_invalid_log_level_blocks(self, harness: Harness):
+        """Test an invalid log level blocks the Envoy component without configuring it."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        harness.update_config({"log-level": "verbose"})
+
+        harness.begin_with_initial_hooks()
+
+        assert isinstance(harness.charm.envoy_pebble_container.status, BlockedStatus)
+        assert "envoy" not in harness.get_container_pebble_plan("envoy").services
+
+    def test_config_file_change_updates_layer(self, harness: Harness):
+        """Test a change of the rendered config file changes the layer, restarting Envoy."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        harness.begin_with_initial_hooks()
+        plan = harness.get_container_pebble_plan("envoy")
+        config_hash = plan.services["envoy"].environment["ENVOY_CONFIG_HASH"]
+
+        harness.update_config({"access-log-sample-percent": 5})
+
+        plan = harness.get_container_pebble_plan("envoy")
+        assert plan.services["envoy"].environment["ENVOY_CONFIG_HASH"] != config_hash
+
+    def test_rejected_config_keeps_previous_config(self, harness: Harness):
+        """Test a config that Envoy rejects is not swapped in and blocks with the error."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        harness.begin_with_initial_hooks()
+        container = harness.charm.unit.get_container("envoy")
+        config = container.pull("/var/lib/pebble/default/envoy-config.yaml").read()
+        plan = harness.get_container_pebble_plan("envoy").to_dict()
+
+        harness.handle_exec(
+            "envoy",
+            ["envoy", "--mode", "validate"],
+            result=ExecResult(exit_code=1, stderr="error initializing configuration: bad port\n"),
+        )
+        harness.update_config({"access-log-sample-percent": 5})
+
+        assert container.pull("/var/lib/pebble/default/envoy-config.yaml").read() == config
+        assert harness.get_container_pebble_plan("envoy").to_dict() == plan
+        assert not container.exists("/var/lib/pebble/default/envoy-config.yaml.candidate")
+        status = harness.charm.envoy_pebble_container.status
+        assert isinstance(status, BlockedStatus)
+        assert "still serving the previous one" in status.message
+        assert "bad port" in status.message
+
+    def test_valid_config_is_validated_once(self, harness: Harness):
+        """Test a config is swapped in once validated, and not validated again while unchanged."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        validations = []
+        harness.handle_exec(
+            "envoy",
+            ["envoy", "--mode", "validate"],
+            handler=lambda args: validations.append(args.command),
+        )
+        harness.begin_with_initial_hooks()
+        harness.charm.on.config_changed.emit()
+
+        assert validations == [
+            [
+                "envoy",
+                "--mode",
+                "validate",
+                "-c",
+                "/var/lib/pebble/default/envoy-config.yaml.candidate",
+            ]
+        ]
+        assert harness.charm.unit.get_container("envoy").exists(
+            "/var/lib/pebble/default/envoy-config.yaml"
+        )
+
+    def test_restart_drains_envoy_first(self, harness: Harness, mocker):
+        """Test Envoy is drained for drain-time before a restart for a new config."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        harness.update_config({"drain-time": 7, "drain-strategy": "immediate"})
+        harness.begin_with_initial_hooks()
+        urlopen = mocker.patch("envoy_admin.urlopen")
+        sleep = mocker.patch("components.pebble.time.sleep")
+
+        harness.update_config({"access-log-sample-percent": 5})
+
+        posted = [call.args[0] for call in urlopen.call_args_list]
+        assert [request.full_url for request in posted] == [
+            "http://localhost:9901/drain_listeners?graceful"
+        ]
+        assert posted[0].method == "POST"
+        sleep.assert_called_once_with(7)
+        command = harness.get_container_pebble_plan("envoy").services["envoy"].command
+        assert "--drain-time-s 7 --drain-strategy immediate" in command
+
+    def test_restart_with_ingress_drain_waits_for_unreadiness(self, harness: Harness, mocker):
+        """Test Envoy fails its readiness until the ready check is down, before draining."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        setup_ingress_relation(harness)
+        harness.update_config(
+            {
+                "drain-time": 5,
+                "ingress-drain": True,
+                "health-check-period": "1m30s",
+                "health-check-threshold": 2,
+            }
+        )
+        harness.begin_with_initial_hooks()
+        urlopen = mocker.patch("envoy_admin.urlopen")
+        sleep = mocker.patch("components.pebble.time.sleep")
+
+        harness.update_config({"access-log-sample-percent": 5})
+
+        assert [call.args[0].selector for call in urlopen.call_args_list] == [
+            "/healthcheck/fail",
+            "/drain_listeners?graceful",
+        ]
+        assert [call.args for call in sleep.call_args_list] == [(180.0,), (5,)]
+
+    def test_stop_drains_envoy_without_ingress_grace_period(self, harness: Harness, mocker):
+        """Test Envoy is drained right away on stop, as its pod is no longer an endpoint."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        setup_ingress_relation(harness)
+        harness.update_config({"drain-time": 5, "ingress-drain": True})
+        harness.begin_with_initial_hooks()
+        urlopen = mocker.patch("envoy_admin.urlopen")
+        sleep = mocker.patch("components.pebble.time.sleep")
+
+        harness.charm.on.stop.emit()
+
+        assert [call.args[0].selector for call in urlopen.call_args_list] == [
+            "/drain_listeners?graceful",
+        ]
+        assert [call.args for call in sleep.call_args_list] == [(5,)]
+
+    def test_unchanged_layer_is_not_drained(self, harness: Harness, mocker):
+        """Test Envoy is not drained when its layer, and so Envoy, is not restarted."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        harness.update_config({"drain-time": 5})
+        harness.begin_with_initial_hooks()
+        urlopen = mocker.patch("envoy_admin.urlopen")
+
+        harness.charm.on.config_changed.emit()
+
+        urlopen.assert_not_called()
+
+    def test_restarts_within_interval_are_coalesced(self, harness: Harness, mocker):
+        """Test changes within min-restart-interval are applied by one deferred restart."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        harness.update_config({"drain-time": 0, "min-restart-interval": 60})
+        now = mocker.patch("components.pebble.time.time", return_value=1000.0)
+        harness.begin_with_initial_hooks()
+        plan = harness.get_container_pebble_plan("envoy").services["envoy"].to_dict()
+
+        now.return_value = 1010.0
+        harness.update_config({"access-log-sample-percent": 5})
+        harness.update_config({"log-level": "debug"})
+
+        services = harness.get_container_pebble_plan("envoy").services
+        assert services["envoy"].to_dict() == plan
+        assert "sleep 50 && " in services["envoy-deferred-apply"].command
+        container = harness.charm.unit.get_container("envoy")
+        assert container.get_service("envoy-deferred-apply").is_running()
+
+        now.return_value = 1060.0
+        harness.pebble_notify("envoy", "charmed-kubeflow.io/envoy-deferred-apply")
+
+        services = harness.get_container_pebble_plan("envoy").services
+        assert "--log-level debug" in services["envoy"].command
+        assert services["envoy"].environment != plan["environment"]
+
+        # The helper service exits once it has notified the charm
+        container.stop("envoy-deferred-apply")
+        harness.charm.on.update_status.emit()
+        assert isinstance(harness.charm.envoy_pebble_container.status, ActiveStatus)
+        assert isinstance(harness.charm.unit.status, ActiveStatus)
+
+    def test_early_deferred_apply_notice_rearms_the_helper(self, harness: Harness, mocker):
+        """Test a notice that comes before min-restart-interval is over schedules another."""
+        setup_grpc_relation(harness, "grpc-one", "8080")
+        harness.update_config({"min-restart-interval": 60})
+        now = mocker.patch("components.pebble.time.time", return_value=1000.0)
+        harness.begin_with_initial_hooks()
+        plan = harness.get_container_pebble_plan("envoy").services["envoy"].to_dict()
+        container = harness.charm.unit.get_container("envoy")
+
+        now.return_value = 1010.0
+        harness.update_config({"log-level": "debug"})
+        now.return_value = 1049.5
+        container.stop("envoy-deferred-apply")
+        harness.pebble_notify("envoy", "charmed-kubeflow.io/envoy-deferred-apply")
+
+        services = harness.get_container_pebble_plan("envoy").services
+        assert services["envoy"].to_dict() == plan
+        assert "sleep 11 && " in services["envoy-deferred-apply"].command
+        assert container.get_service("envoy-deferred-apply").is_running()
+
+    def test_start_before_upstream_adds_upstream_without_restart(self, harness: Harness):
+        """Test Envoy starts without the grpc relation and gets its upstream without a restart."""
+        harness.update_config({"start-before-upstream": True})
+        harness.begin_with_initial_hooks()
+        container = harness.charm.unit.get_container("envoy")
+        plan = harness.get_container_pebble_plan("envoy").to_dict()
+
+        assert container.get_service("envoy").is_running()
+        assert (
+            "service-name" not in container.pull("/var/lib/pebble/default/envoy-cds.yaml").read()
+        )
+        assert isinstance(harness.charm.envoy_pebble_container.status, ActiveStatus)
+
+        setup_grpc_relation(harness, "grpc-one", "8080")
+
+        assert "service-name" in container.pull("/var/lib/pebble/default/envoy-cds.yaml").read()
+        assert harness.get_container_pebble_plan("envoy").to_dict() == plan
+
 
 def setup_ingress_relation(harness: Harness):
     rel_id = harness.add_relation(
@@ -0,0 +1,78 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+from ops.testing import Harness
+
+DASHBOARDS_DIR = Path("src/grafana_dashboards")
+
+
+@pytest.fixture()
+def harness(unstarted_harness) -> Harness:
+    unstarted_harness.set_leader(True)
+    unstarted_harness.begin()
+    return unstarted_harness
+
+
+@pytest.fixture()
+def dashboards_dir(harness, tmp_path) -> Path:
+    """Point the provider at a copy of the charm's dashboards, which tests can change."""
+    shutil.copytree(DASHBOARDS_DIR, tmp_path / "dashboards")
+    harness.charm.dashboard_provider._dashboards_path = str(tmp_path / "dashboards")
+    return tmp_path / "dashboards"
+
+
+@pytest.fixture()
+def compress(mocker):
+    return mocker.spy(
+        sys.modules["charms.grafana_k8s.v0.grafana_dashboard"].LZMABase64, "compress"
+    )
+
+
+def test_unchanged_dashboards_are_not_recompressed(harness, dashboards_dir, compress):
+    provider = harness.charm.dashboard_provider
+    provider._update_all_dashboards_from_dir()
+    compressed_count = compress.call_count
+    assert compressed_count > 0
+
+    provider._update_all_dashboards_from_dir()
+    assert compress.call_count == compressed_count
+
+    dashboard = next(dashboards_dir.glob("*.json*"))
+    dashboard.write_text(json.dumps({"title": "changed"}))
+    provider._update_all_dashboards_from_dir()
+    assert compress.call_count == compressed_count + 1
+    compress.assert_called_with(dashboard.read_bytes())
+
+
+def test_removed_dashboards_are_unpublished(harness, dashboards_dir):
+    provider = harness.charm.dashboard_provider
+    provider._update_all_dashboards_from_dir()
+    dashboard = next(dashboards_dir.glob("*.json*"))
+
+    dashboard.unlink()
+    provider._update_all_dashboards_from_dir()
+
+    assert f"file:{dashboard.stem}" not in provider._stored.dashboard_templates
+
+
+def test_unchanged_dashboards_are_not_republished(harness, dashboards_dir, mocker):
+    relation_id = harness.add_relation("grafana-dashboard", "grafana")
+    published = harness.get_relation_data(relation_id, "envoy")["dashboards"]
+
+    update_relation_data = mocker.spy(harness._backend, "update_relation_data")
+    harness.charm.dashboard_provider._update_all_dashboards_from_dir()
+    update_relation_data.assert_not_called()
+    assert harness.get_relation_data(relation_id, "envoy")["dashboards"] == published
+
+    next(dashboards_dir.glob("*.json*")).write_text(json.dumps({"title": "changed"}))
+    harness.charm.dashboard_provider._update_all_dashboards_from_dir()
+    update_relation_data.assert_called_once()
+    assert (
+        json.loads(harness.get_relation_data(relation_id, "envoy")["dashboards"])["uuid"]
+        != json.loads(published)["uuid"]
+    )
@@ -0,0 +1,180 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import copy
+import json
+from pathlib import Path
+
+import pytest
+import yaml
+from ops.testing import ActionFailed, Harness
+
+from charm import GRPC_RELATION_NAME
+from envoy_admin import EnvoyAdminError
+from envoy_config_diff import (
+    BOOTSTRAP_DUMP_TYPE,
+    CLUSTERS_DUMP_TYPE,
+    ConfigDifference,
+    diff_config,
+)
+
+CONFIG_DUMP_PATH = Path(__file__).parent / "data" / "config_dump.json"
+RUNTIME_JSON = {
+    "layers": ["static_layer_0", "admin"],
+    "entries": {"access_log.ingress_http.sample_percent": {"final_value": "5"}},
+}
+
+
+@pytest.fixture()
+def harness(harness) -> Harness:
+    harness.add_relation(
+        GRPC_RELATION_NAME, "mlmd", app_data={"name": "metadata-grpc-service", "port": "8080"}
+    )
+    return harness
+
+
+def as_dumped_by_envoy(rendered: dict) -> dict:
+    """Return the rendered config the way Envoy dumps it, without changing its meaning.
+
+    Envoy fills in some defaults, respells durations, and leaves out the fields set to their
+    default value, such as codec_type auto or lb_policy round_robin.
+    """
+    live = copy.deepcopy(rendered)
+    listener = live["static_resources"]["listeners"][0]
+    listener["per_connection_buffer_limit_bytes"] = 1048576
+    http_connection_manager = listener["filter_chains"][0]["filters"][0]["typed_config"]
+    del http_connection_manager["codec_type"]
+    for access_log in http_connection_manager.get("access_log", []):
+        del access_log["filter"]["runtime_filter"]["percent_sampled"]["denominator"]
+    for cluster in live["static_resources"].get("clusters", []):
+        cluster["connect_timeout"] = "30s"
+        del cluster["lb_policy"]
+    return live
+
+
+def config_dump(bootstrap: dict, dynamic_clusters=(), warming_clusters=()) -> dict:
+    return {
+        "configs": [
+            {"@type": BOOTSTRAP_DUMP_TYPE, "bootstrap": bootstrap},
+            {
+                "@type": CLUSTERS_DUMP_TYPE,
+                "dynamic_active_clusters": [{"cluster": c} for c in dynamic_clusters],
+                "dynamic_warming_clusters": [{"cluster": c} for c in warming_clusters],
+            },
+        ]
+    }
+
+
+@pytest.fixture()
+def admin(mocker):
+    admin = mocker.patch("charm.EnvoyAdminClient").return_value
+    admin.config_dump = {}
+    admin.get_json.side_effect = lambda path: (
+        admin.config_dump if path == "/config_dump" else RUNTIME_JSON
+    )
+    return admin
+
+
+def test_equivalent_spellings_are_not_differences():
+    expected = {"timeout": "30.0s", "codec_type": "auto", "port_value": 8080, "max_age": "17"}
+    live = {"timeout": "30s", "codec_type": "AUTO", "port_value": "8080", "max_age": 17}
+
+    assert diff_config(expected, live) == []
+
+
+def test_missing_fields_only_differ_if_not_default():
+    expected = {"clusters": [{"name": "a", "lb_policy": "round_robin", "type": "logical_dns"}]}
+
+    assert diff_config(expected, {"clusters": [{"name": "a"}]}) == [
+        ConfigDifference("clusters[a].type", "logical_dns", None)
+    ]
+
+
+def test_enum_defaults_only_apply_to_their_message():
+    expected = {"clusters": [{"name": "a", "type": "static"}], "type": "static"}
+
+    assert diff_config(expected, {"clusters": [{"name": "a"}]}) == [
+        ConfigDifference("type", "static", None)
+    ]
+
+
+def test_differences_are_matched_by_name():
+    expected = {"clusters": [{"name": "a", "port": 1}, {"name": "b", "port": 2}], "off": False}
+    live = {"clusters": [{"name": "b", "port": 3}]}
+
+    assert diff_config(expected, live) == [
+        ConfigDifference("clusters[a]", {"name": "a", "port": 1}, None),
+        ConfigDifference("clusters[b].port", 2, 3),
+    ]
+
+
+@pytest.mark.parametrize("config", [{}, {"access-log-sample-percent": 5}])
+def test_dump_config_in_sync(harness, admin, config):
+    harness.update_config(config)
+    rendered = yaml.safe_load(harness.charm.envoy_config_template.render_source_template())
+    admin.config_dump = config_dump(as_dumped_by_envoy(rendered))
+
+    output = harness.run_action("dump-config")
+
+    assert output.results["in-sync"] == "true"
+    assert json.loads(output.results["differences"]) == []
+    assert json.loads(output.results["runtime"]) == {"access_log.ingress_http.sample_percent": "5"}
+    assert output.results["warming-clusters"] == ""
+    assert "config-dump" not in output.results
+
+
+def test_dump_config_in_sync_with_envoy_dump(harness, admin):
+    """Compare with Envoy 1.31's /config_dump of the config rendered for this case.
+
+    The dump leaves out defaults such as codec_type AUTO, upper cases the other enums,
+    respells durations, adds the node's build details, and lists admin.access_log.
+    """
+    harness.update_config({"access-log-sample-percent": 10})
+    admin.config_dump = json.loads(CONFIG_DUMP_PATH.read_text())
+
+    output = harness.run_action("dump-config")
+
+    assert json.loads(output.results["differences"]) == []
+    assert output.results["in-sync"] == "true"
+
+
+def test_dump_config_reports_change_not_applied(harness, admin):
+    rendered = yaml.safe_load(harness.charm.envoy_config_template.render_source_template())
+    admin.config_dump = config_dump(as_dumped_by_envoy(rendered))
+    harness.update_config({"http-port": "8081"})
+
+    output = harness.run_action("dump-config", {"include-dump": True})
+
+    assert output.results["in-sync"] == "false"
+    (difference,) = json.loads(output.results["differences"])
+    assert difference == {
+        "path": "static_resources.listeners[listener_0].address.socket_address.port_value",
+        "expected": 8081,
+        "live": 9090,
+    }
+    assert json.loads(output.results["config-dump"]) == admin.config_dump
+
+
+def test_dump_config_compares_dynamic_clusters(harness, admin):
+    harness.update_config({"start-before-upstream": True})
+    rendered = yaml.safe_load(harness.charm.envoy_config_template.render_source_template())
+    placeholder = {"name": "metadata-cluster", "connect_timeout": "1s", "load_assignment": {}}
+    (cluster,) = yaml.safe_load(harness.charm.envoy_cds_template.render_source_template())[
+        "resources"
+    ]
+    admin.config_dump = config_dump(
+        as_dumped_by_envoy(rendered), dynamic_clusters=[placeholder], warming_clusters=[cluster]
+    )
+
+    output = harness.run_action("dump-config")
+
+    assert output.results["warming-clusters"] == "metadata-cluster"
+    paths = [difference["path"] for difference in json.loads(output.results["differences"])]
+    assert "clusters[metadata-cluster].type" in paths
+    assert "clusters[metadata-cluster].load_assignment.endpoints" in paths
+
+
+def test_dump_config_fails_without_envoy(harness, admin):
+    admin.get_json.side_effect = EnvoyAdminError("connection refused")
+
+    with pytest.raises(ActionFailed, match="connection refused"):
+        harness.run_action("dump-config")
@@ -0,0 +1,150 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Golden file tests and render-time budget for the rendered envoy-config.yaml.j2.
+
+To regenerate the golden files after an intended template change, run the unit tests with
+UPDATE_GOLDEN_FILES=1 and review the resulting diff.
+"""
+
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+import yaml
+from ops.testing import Harness
+
+from charm import ENVOY_CDS_FILE_DESTINATION_PATH, GRPC_RELATION_NAME
+
+GOLDEN_FILES_DIR = Path(__file__).parent / "golden" / "envoy-config"
+UPDATE_GOLDEN_FILES = os.environ.get("UPDATE_GOLDEN_FILES") == "1"
+# Rendering happens on every reconcile, so it should stay well below the cost of a hook
+RENDER_BUDGET_S = 0.05
+RENDER_ITERATIONS = 50
+
+CASES = {
+    "default": {
+        "config": {},
+        "grpc_data": {"name": "metadata-grpc-service", "port": "8080"},
+    },
+    "custom-ports": {
+        "config": {"admin-port": "9999", "http-port": "8888"},
+        "grpc_data": {"name": "metadata-grpc-service", "port": "8080"},
+    },
+    "fqdn-upstream": {
+        "config": {},
+        "grpc_data": {"name": "mlmd.kubeflow.svc.cluster.local", "port": "443"},
+    },
+    "sampled-json-access-log": {
+        "config": {"access-log-sample-percent": 10, "log-format": "json"},
+        "grpc_data": {"name": "metadata-grpc-service", "port": "8080"},
+    },
+    "start-before-upstream": {
+        "config": {"start-before-upstream": True},
+        "grpc_data": {"name": "metadata-grpc-service", "port": "8080"},
+    },
+}
+
+
+@pytest.fixture()
+def harness(unstarted_harness) -> Harness:
+    unstarted_harness.set_leader(True)
+    return unstarted_harness
+
+
+def render(harness: Harness, config: dict, grpc_data: dict) -> str:
+    """Render the charm's Envoy config for the given charm config and grpc relation data."""
+    harness.update_config(config)
+    harness.add_relation(GRPC_RELATION_NAME, "mlmd", app_data=grpc_data)
+    harness.begin()
+    return harness.charm.envoy_config_template.render_source_template()
+
+
+@pytest.mark.parametrize("case", CASES.keys())
+def test_rendered_config_matches_golden_file(harness, case):
+    rendered = render(harness, **CASES[case])
+    golden_file = GOLDEN_FILES_DIR / f"{case}.yaml"
+
+    if UPDATE_GOLDEN_FILES:
+        golden_file.parent.mkdir(parents=True, exist_ok=True)
+        golden_file.write_text(rendered)
+
+    assert rendered == golden_file.read_text()
+
+
+@pytest.mark.parametrize("case", CASES.keys())
+def test_rendered_config_structure(harness, case):
+    config = CASES[case]["config"]
+    grpc_data = CASES[case]["grpc_data"]
+    rendered = yaml.safe_load(render(harness, config, grpc_data))
+    charm_config = harness.charm.config
+
+    admin_address = rendered["admin"]["address"]["socket_address"]
+    assert admin_address["port_value"] == int(charm_config["admin-port"])
+
+    (listener,) = rendered["static_resources"]["listeners"]
+    assert listener["address"]["socket_address"]["port_value"] == int(charm_config["http-port"])
+    (http_connection_manager,) = listener["filter_chains"][0]["filters"]
+    http_filters = [f["name"] for f in http_connection_manager["typed_config"]["http_filters"]]
+    assert http_filters[-1] == "envoy.filters.http.router"
+    assert "envoy.filters.http.grpc_web" in http_filters
+    access_logs = http_connection_manager["typed_config"].get("access_log", [])
+    assert len(access_logs) == (1 if charm_config["access-log-sample-percent"] else 0)
+
+    if charm_config["start-before-upstream"]:
+        assert "clusters" not in rendered["static_resources"]
+        cds_config = rendered["dynamic_resources"]["cds_config"]
+        assert cds_config["path_config_source"]["path"] == str(ENVOY_CDS_FILE_DESTINATION_PATH)
+        cds = yaml.safe_load(harness.charm.envoy_cds_template.render_source_template())
+        (cluster,) = cds["resources"]
+    else:
+        (cluster,) = rendered["static_resources"]["clusters"]
+    assert cluster["name"] == "metadata-cluster"
+    (endpoint,) = cluster["load_assignment"]["endpoints"][0]["lb_endpoints"]
+    upstream_address = endpoint["endpoint"]["address"]["socket_address"]
+    assert upstream_address["address"] == grpc_data["name"]
+    assert upstream_address["port_value"] == int(grpc_data["port"])
+
+
+@pytest.mark.skipif(shutil.which("envoy") is None, reason="envoy binary not available")
+@pytest.mark.parametrize("case", CASES.keys())
+def test_rendered_config_is_valid_for_envoy(harness, case, tmp_path):
+    config_path = tmp_path / "envoy-config.yaml"
+    cds_path = tmp_path / "envoy-cds.yaml"
+    rendered = render(harness, **CASES[case])
+    cds_path.write_text(harness.charm.envoy_cds_template.render_source_template())
+    config_path.write_text(rendered.replace(str(ENVOY_CDS_FILE_DESTINATION_PATH), str(cds_path)))
+
+    result = subprocess.run(
+        ["envoy", "--mode", "validate", "-c", str(config_path)],
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_cds_placeholder_until_grpc_relation_has_data(harness):
+    harness.update_config({"start-before-upstream": True})
+    harness.begin()
+
+    (cluster,) = yaml.safe_load(harness.charm.envoy_cds_template.render_source_template())[
+        "resources"
+    ]
+
+    assert cluster["name"] == "metadata-cluster"
+    assert cluster["load_assignment"]["endpoints"] == []
+
+
+def test_render_time_within_budget(harness):
+    render(harness, **CASES["default"])
+    template = harness.charm.envoy_config_template
+
+    start = time.perf_counter()
+    for _ in range(RENDER_ITERATIONS):
+        template.render_source_template()
+    mean_render_time = (time.perf_counter() - start) / RENDER_ITERATIONS
+
+    assert mean_render_time < RENDER_BUDGET_S
@@ -0,0 +1,109 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import json
+from pathlib import Path
+
+import pytest
+from ops.testing import ActionFailed, Harness
+
+from envoy_admin import EnvoyAdminError
+
+
+@pytest.fixture()
+def harness(harness, mocker, tmp_path) -> Harness:
+    mocker.patch("charm.PROFILES_DIR", tmp_path)
+    mocker.patch("envoy_profiler.time.sleep")
+    harness.set_can_connect("envoy", True)
+    return harness
+
+
+@pytest.fixture()
+def admin(harness, mocker):
+    """Mock Envoy's admin interface, whose profilers write their files when stopped."""
+    container = harness.charm.unit.get_container("envoy")
+    container.make_dir("/tmp")
+    admin = mocker.patch("charm.EnvoyAdminClient").return_value
+
+    def post(path, params):
+        if params == {"enable": "n"}:
+            if path == "/cpuprofiler":
+                container.push("/tmp/envoy.prof", b"cpu profile")
+            else:
+                container.push("/tmp/envoy.prof.0001.heap", b"heap profile")
+
+    admin.post.side_effect = post
+    memory = iter(
+        [{"allocated": "1000", "heap_size": "4096"}, {"allocated": "1500", "heap_size": "4096"}]
+    )
+    stats = iter(
+        [
+            {"stats": [{"name": "http.ingress_http.downstream_rq_total", "value": 10}]},
+            {"stats": [{"name": "http.ingress_http.downstream_rq_total", "value": 25}]},
+        ]
+    )
+    admin.get_json.side_effect = lambda path, params=None: (
+        next(memory) if path == "/memory" else next(stats)
+    )
+    return admin
+
+
+def test_profile_collects_cpu_and_heap_profiles(harness, admin):
+    container = harness.charm.unit.get_container("envoy")
+    container.push("/tmp/envoy.prof", b"stale profile")
+
+    output = harness.run_action("profile", {"duration": 5, "heap": True})
+
+    assert [call.args for call in admin.post.call_args_list] == [
+        ("/cpuprofiler", {"enable": "y"}),
+        ("/heapprofiler", {"enable": "y"}),
+        ("/cpuprofiler", {"enable": "n"}),
+        ("/heapprofiler", {"enable": "n"}),
+    ]
+    profiles = output.results["profiles"].splitlines()
+    assert [path.rsplit("/", 1)[1] for path in profiles] == ["envoy.prof", "envoy.prof.0001.heap"]
+    with open(profiles[0], "rb") as profile:
+        assert profile.read() == b"cpu profile"
+    assert not container.list_files("/tmp", pattern="envoy.prof*")
+    assert "memory-deltas" not in output.results
+
+
+def test_profile_keeps_the_latest_runs(harness, admin, tmp_path):
+    for run in ["20260101-000000", "20260102-000000", "20260103-000000"]:
+        (tmp_path / run).mkdir()
+        (tmp_path / run / "envoy.prof").write_bytes(b"old cpu profile")
+
+    output = harness.run_action("profile")
+
+    (profile,) = output.results["profiles"].splitlines()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "20260102-000000",
+        "20260103-000000",
+        Path(profile).parent.name,
+    ]
+
+
+def test_profile_deltas(harness, admin):
+    output = harness.run_action("profile", {"deltas": True})
+
+    assert json.loads(output.results["memory-deltas"]) == {"allocated": 500, "heap_size": 0}
+    assert json.loads(output.results["stats-deltas"]) == {
+        "http.ingress_http.downstream_rq_total": 15
+    }
+
+
+def test_profile_stops_profilers_when_one_is_unsupported(harness, admin):
+    def post(path, params):
+        if path == "/heapprofiler":
+            raise EnvoyAdminError("POST /heapprofiler failed: 500 heap profiler not supported")
+
+    admin.post.side_effect = post
+
+    with pytest.raises(ActionFailed, match="heap profiler not supported"):
+        harness.run_action("profile", {"heap": True})
+
+    assert admin.post.call_args_list[-1].args == ("/cpuprofiler", {"enable": "n"})
+
+
+def test_profile_needs_a_profiler(harness, admin):
+    with pytest.raises(ActionFailed, match="Nothing to profile"):
+        harness.run_action("profile", {"cpu": False})
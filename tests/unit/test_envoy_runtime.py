@@ -0,0 +1,149 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import json
+from pathlib import PurePosixPath
+
+import pytest
+from ops import ActiveStatus, BlockedStatus
+from ops.testing import ActionFailed, ExecResult, Harness
+
+from charm import ENVOY_RUNTIME_DIR
+from components.envoy_runtime import RuntimeOverridesError, parse_runtime_overrides
+
+
+@pytest.fixture()
+def harness(harness) -> Harness:
+    harness.set_can_connect("envoy", True)
+    return harness
+
+
+@pytest.fixture()
+def links(harness):
+    """Record the symlinks swapped in the workload container, as {link: target}."""
+    links = {}
+    harness.handle_exec(
+        "envoy", ["ln"], handler=lambda args: links.update({args.command[3]: args.command[2]})
+    )
+    harness.handle_exec(
+        "envoy",
+        ["mv"],
+        handler=lambda args: links.update({args.command[3]: links.pop(args.command[2])}),
+    )
+    return links
+
+
+def read_runtime(harness, links) -> dict:
+    """Return the runtime values of the current snapshot, as Envoy's disk layer reads them."""
+    container = harness.charm.unit.get_container("envoy")
+    root = ENVOY_RUNTIME_DIR / links[str(ENVOY_RUNTIME_DIR / "current")] / "envoy"
+    values = {}
+    pending = [root]
+    while pending:
+        for file in container.list_files(pending.pop()):
+            if file.type.value == "directory":
+                pending.append(file.path)
+            else:
+                key = str(PurePosixPath(file.path).relative_to(root)).replace("/", ".")
+                values[key] = container.pull(file.path).read()
+    return values
+
+
+def test_parse_runtime_overrides():
+    assert parse_runtime_overrides({"overload.threshold": 0.95, "feature.enabled": True}) == {
+        "overload.threshold": "0.95",
+        "feature.enabled": "true",
+    }
+    with pytest.raises(RuntimeOverridesError, match="prefix"):
+        parse_runtime_overrides({"a.b": 1, "a.b.c": 2})
+    with pytest.raises(RuntimeOverridesError, match="Invalid runtime key"):
+        parse_runtime_overrides({"../etc": 1})
+
+
+def test_runtime_overrides_config_is_written(harness, links):
+    harness.update_config(
+        {"runtime-overrides": "circuit_breakers.metadata-cluster.default.max_requests: 2048"}
+    )
+
+    assert read_runtime(harness, links) == {
+        "circuit_breakers.metadata-cluster.default.max_requests": "2048"
+    }
+    assert harness.charm.envoy_runtime.component.status == ActiveStatus()
+
+
+def test_no_exec_without_runtime_overrides(harness):
+    # Without ln and mv handlers, an exec would raise
+    harness.charm.on.config_changed.emit()
+
+    container = harness.charm.unit.get_container("envoy")
+    assert container.exists(ENVOY_RUNTIME_DIR)
+    assert container.list_files(ENVOY_RUNTIME_DIR) == []
+
+
+def test_invalid_runtime_overrides_block(harness, links):
+    harness.update_config({"runtime-overrides": "[max_requests, 2048]"})
+
+    assert isinstance(harness.charm.envoy_runtime.component.status, BlockedStatus)
+    assert links == {}
+
+
+def test_set_runtime_action_overrides_config(harness, links):
+    harness.update_config(
+        {
+            "runtime-overrides": "{access_log.ingress_http.sample_percent: 5, overload.threshold: 0.9}"
+        }
+    )
+    previous_snapshot = links[str(ENVOY_RUNTIME_DIR / "current")]
+
+    output = harness.run_action(
+        "set-runtime",
+        {"values": "access_log.ingress_http.sample_percent=50, overload.threshold="},
+    )
+
+    assert json.loads(output.results["runtime"]) == {
+        "access_log.ingress_http.sample_percent": "50"
+    }
+    assert read_runtime(harness, links) == {"access_log.ingress_http.sample_percent": "50"}
+    container = harness.charm.unit.get_container("envoy")
+    assert not container.exists(ENVOY_RUNTIME_DIR / previous_snapshot)
+
+    # The values of the action are kept across hooks, until reset
+    harness.charm.on.config_changed.emit()
+    assert read_runtime(harness, links) == {"access_log.ingress_http.sample_percent": "50"}
+    harness.run_action("set-runtime", {"reset": True})
+    assert read_runtime(harness, links) == {
+        "access_log.ingress_http.sample_percent": "5",
+        "overload.threshold": "0.9",
+    }
+
+
+def test_set_runtime_action_rejects_invalid_values(harness, links):
+    with pytest.raises(ActionFailed, match="expected <key>=<value>"):
+        harness.run_action("set-runtime", {"values": "max_requests"})
+    with pytest.raises(ActionFailed, match="Invalid runtime key"):
+        harness.run_action("set-runtime", {"values": "a/b=1"})
+
+    assert links == {}
+
+
+def test_failed_set_runtime_action_keeps_nothing(harness, links):
+    harness.set_can_connect("envoy", False)
+    with pytest.raises(ActionFailed, match="Cannot connect"):
+        harness.run_action("set-runtime", {"values": "overload.threshold=0.9"})
+
+    harness.set_can_connect("envoy", True)
+    harness.update_config({"runtime-overrides": "a.b: 1"})
+    with pytest.raises(ActionFailed, match="prefix"):
+        harness.run_action("set-runtime", {"values": "a.b.c=2"})
+
+    harness.charm.on.config_changed.emit()
+    assert read_runtime(harness, links) == {"a.b": "1"}
+
+
+def test_set_runtime_action_reports_write_errors(harness):
+    harness.handle_exec("envoy", ["ln"], result=ExecResult(exit_code=1, stderr="read-only"))
+
+    with pytest.raises(ActionFailed) as error:
+        harness.run_action("set-runtime", {"values": "overload.threshold=0.9"})
+
+    assert "Could not write Envoy's runtime overrides" in error.value.message
+    assert harness.charm.envoy_runtime.component._stored.action_overrides == {}
@@ -0,0 +1,145 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import json
+
+import pytest
+from ops.model import ActiveStatus, BlockedStatus
+from ops.testing import ActionFailed, Harness
+
+from envoy_admin import EnvoyAdminError
+
+QUANTILES = [0, 25, 50, 75, 90, 95, 99, 99.5, 99.9, 100]
+
+
+def stats_json(ingress_requests: int, upstream_requests: int) -> dict:
+    """Return a response of /stats?format=json with the given request counters."""
+    return {
+        "stats": [
+            {"name": "http.ingress_http.downstream_rq_total", "value": ingress_requests},
+            {"name": "http.ingress_http.downstream_cx_active", "value": 4},
+            {"name": "http.ingress_http.downstream_rq_active", "value": 2},
+            {"name": "cluster.metadata-cluster.upstream_rq_total", "value": upstream_requests},
+            {"name": "cluster.metadata-cluster.upstream_rq_pending_active", "value": 1},
+            {"name": "cluster.metadata-cluster.upstream_rq_pending_overflow", "value": 3},
+            {"name": "cluster.metadata-cluster.upstream_rq_5xx", "value": 7},
+            {
+                "histograms": {
+                    "supported_quantiles": QUANTILES,
+                    "computed_quantiles": [
+                        {
+                            "name": "http.ingress_http.downstream_rq_time",
+                            "values": [
+                                {"interval": None, "cumulative": q / 10} for q in QUANTILES
+                            ],
+                        },
+                        {
+                            "name": "cluster.metadata-cluster.upstream_rq_time",
+                            "values": [{"interval": None, "cumulative": None} for _ in QUANTILES],
+                        },
+                    ],
+                }
+            },
+        ]
+    }
+
+
+CLUSTERS_JSON = {
+    "cluster_statuses": [
+        {
+            "name": "metadata-cluster",
+            "host_statuses": [
+                {"health_status": {"eds_health_status": "HEALTHY"}},
+                {
+                    "health_status": {
+                        "eds_health_status": "HEALTHY",
+                        "failed_outlier_check": True,
+                    }
+                },
+            ],
+        }
+    ]
+}
+
+
+@pytest.fixture()
+def harness(harness, mocker) -> Harness:
+    mocker.patch("charm.time.sleep")
+    return harness
+
+
+@pytest.fixture()
+def admin(mocker):
+    """Mock Envoy's admin interface, answering two stats snapshots 100 requests apart."""
+    admin = mocker.patch("charm.EnvoyAdminClient").return_value
+    snapshots = iter([stats_json(1000, 900), stats_json(1100, 950)])
+    admin.get_json.side_effect = lambda path, params: (
+        next(snapshots) if path == "/stats" else CLUSTERS_JSON
+    )
+    return admin
+
+
+def test_get_stats_summarizes_listener_and_cluster(harness, admin, mocker):
+    mocker.patch("charm.time.monotonic", side_effect=[0.0, 10.0])
+
+    output = harness.run_action("get-stats", {"sample-seconds": 10})
+
+    assert output.results["ingress-http"] == {
+        "rps": "10.00",
+        "active-connections": "4",
+        "active-requests": "2",
+        "p50-ms": "5",
+        "p90-ms": "9",
+        "p99-ms": "9.9",
+    }
+    upstream = output.results["metadata-cluster"]
+    assert upstream["rps"] == "5.00"
+    assert upstream["pending-requests"] == "1"
+    assert upstream["overflow-pending-requests"] == "3"
+    assert upstream["overflow-connections"] == "0"
+    assert (upstream["hosts"], upstream["healthy-hosts"]) == ("2", "1")
+    assert upstream["p99-ms"] == "n/a"
+    assert "stats" not in output.results
+
+
+def test_get_stats_filter(harness, admin):
+    output = harness.run_action("get-stats", {"filter": r"upstream_rq_(pending_overflow|5xx)"})
+
+    assert json.loads(output.results["stats"]) == {
+        "cluster.metadata-cluster.upstream_rq_5xx": 7,
+        "cluster.metadata-cluster.upstream_rq_pending_overflow": 3,
+    }
+
+
+def test_get_stats_fails_on_invalid_filter(harness, admin):
+    with pytest.raises(ActionFailed, match="Invalid filter regex"):
+        harness.run_action("get-stats", {"filter": "("})
+
+
+def test_get_stats_fails_without_envoy(harness, admin):
+    admin.get_json.side_effect = EnvoyAdminError("connection refused")
+
+    with pytest.raises(ActionFailed, match="connection refused"):
+        harness.run_action("get-stats")
+
+
+def test_stats_in_status(harness, admin):
+    harness.update_config({"stats-in-status": True})
+    harness.charm.unit.status = ActiveStatus()
+    harness.charm._on_update_status(None)
+    # As if the previous update-status hook was 5 minutes ago
+    harness.charm._stored.status_stats_time -= 300
+    harness.charm._on_update_status(None)
+
+    assert harness.charm.unit.status == ActiveStatus(
+        "0.33 rps, 4 conns, p50 5ms, p99 9.9ms, 1 pending, 3 overflows"
+    )
+
+
+def test_stats_not_in_inactive_status(harness, admin):
+    harness.update_config({"stats-in-status": True})
+    harness.charm.unit.status = BlockedStatus("blocked")
+
+    harness.charm._on_update_status(None)
+
+    assert harness.charm.unit.status == BlockedStatus("blocked")
+    admin.get_json.assert_not_called()
@@ -0,0 +1,60 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import json
+import logging
+
+import pytest
+from ops.testing import Harness
+
+from hook_timing import TRACE_FILE_NAME, TRACE_MAX_HOOKS, HookTimer
+
+
+@pytest.fixture()
+def harness(unstarted_harness) -> Harness:
+    unstarted_harness.set_leader(True)
+    return unstarted_harness
+
+
+def test_timing_off_by_default(harness, caplog):
+    with caplog.at_level(logging.INFO):
+        harness.begin_with_initial_hooks()
+
+    assert not harness.charm.hook_timer.enabled
+    assert "hook-timing" not in caplog.text
+
+
+def test_timing_logs_components_and_libraries(harness, caplog):
+    harness.update_config({"hook-timing": "log"})
+    with caplog.at_level(logging.INFO):
+        harness.begin_with_initial_hooks()
+
+    measured = {(m["name"], m["phase"]) for m in harness.charm.hook_timer.measurements}
+    assert ("leadership-gate", "configure") in measured
+    assert ("grpc", "status") in measured
+    assert ("MetricsEndpointProvider", "init") in measured
+    assert ("LogForwarder", "init") in measured
+    assert "hook-timing {" in caplog.text
+
+
+def test_invalid_mode_disables_timing():
+    timer = HookTimer(mode="verbose")
+
+    assert timer.mode == "off"
+    with timer.measure("anything", "init"):
+        pass
+    assert timer.measurements == []
+
+
+def test_trace_is_bounded(tmp_path):
+    trace_path = tmp_path / TRACE_FILE_NAME
+    trace_path.write_text(json.dumps([{"hook": f"old-{i}"} for i in range(TRACE_MAX_HOOKS)]))
+    timer = HookTimer(mode="trace", trace_dir=tmp_path)
+    with timer.measure("component", "configure"):
+        pass
+
+    timer.write_trace()
+
+    hooks = json.loads(trace_path.read_text())
+    assert len(hooks) == TRACE_MAX_HOOKS
+    assert hooks[0]["hook"] == "old-1"
+    assert hooks[-1]["measurements"][0]["name"] == "component"
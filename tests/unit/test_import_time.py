@@ -0,0 +1,91 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Guards the import cost paid by every hook before any handler runs."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+from ops.testing import Harness
+
+from charm import EnvoyOperator
+
+# Modules that must only be imported by the hooks that use them
+DEFERRED_MODULES = [
+    "charms.grafana_k8s.v0.grafana_dashboard",
+    "charms.istio_beacon_k8s.v0.service_mesh",
+    "charms.istio_ingress_k8s.v0.istio_ingress_route",
+    "charms.loki_k8s.v1.loki_push_api",
+    "charms.observability_libs.v1.kubernetes_service_patch",
+    "charms.prometheus_k8s.v0.prometheus_scrape",
+    "cosl",
+    "dashboard_provider",
+    "log_forwarder",
+    "metrics_provider",
+    "service_patch",
+]
+# Generous, to stay stable on slow CI runners.  Most of this is ops and chisme.
+IMPORT_TIME_BUDGET_US = 3_000_000
+
+
+def import_times(module: str) -> dict:
+    """Return {module: cumulative import time in us} from `python -X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_charm_import_defers_heavy_libraries():
+    times = import_times("charm")
+
+    imported = [module for module in DEFERRED_MODULES if module in times]
+    assert imported == [], f"Imported at charm import time: {imported}"
+    assert times["charm"] < IMPORT_TIME_BUDGET_US
+
+
+@pytest.mark.parametrize(
+    "hook, loaded, skipped",
+    [
+        (
+            "update-status",
+            ["service_patcher"],
+            ["prometheus_provider", "dashboard_provider", "_logging"],
+        ),
+        (
+            "grafana-dashboard-relation-changed",
+            ["dashboard_provider"],
+            ["service_patcher", "prometheus_provider", "_logging"],
+        ),
+        (
+            "config-changed",
+            ["service_patcher", "prometheus_provider", "dashboard_provider", "_logging"],
+            [],
+        ),
+        (
+            "logging-relation-changed",
+            ["_logging"],
+            ["service_patcher", "prometheus_provider", "dashboard_provider"],
+        ),
+    ],
+)
+def test_libraries_loaded_only_for_relevant_hooks(mocker, monkeypatch, hook, loaded, skipped):
+    mocker.patch("charm.KubernetesServicePatch")
+    monkeypatch.setenv("JUJU_DISPATCH_PATH", f"hooks/{hook}")
+    harness = Harness(EnvoyOperator)
+    harness.begin()
+
+    assert all(getattr(harness.charm, attribute) is not None for attribute in loaded)
+    assert all(getattr(harness.charm, attribute) is None for attribute in skipped)
+    harness.cleanup()
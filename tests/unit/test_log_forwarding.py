@@ -0,0 +1,60 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import json
+
+import pytest
+from ops.testing import Harness
+
+LOKI_URL = "http://loki-{}:3100/loki/api/v1/push"
+
+
+@pytest.fixture()
+def harness(harness) -> Harness:
+    harness.set_can_connect("envoy", True)
+    return harness
+
+
+def add_loki_unit(harness, relation_id: int, unit: int) -> None:
+    harness.add_relation_unit(relation_id, f"loki/{unit}")
+    harness.update_relation_data(
+        relation_id, f"loki/{unit}", {"endpoint": json.dumps({"url": LOKI_URL.format(unit)})}
+    )
+
+
+def log_targets(harness) -> dict:
+    return harness.charm.unit.get_container("envoy").get_plan().to_dict().get("log-targets", {})
+
+
+def test_log_targets_follow_loki_units(harness):
+    relation_id = harness.add_relation("logging", "loki")
+    add_loki_unit(harness, relation_id, 0)
+    add_loki_unit(harness, relation_id, 1)
+
+    assert log_targets(harness)["loki/1"]["location"] == LOKI_URL.format(1)
+    assert log_targets(harness)["loki/1"]["services"] == ["envoy"]
+
+    harness.remove_relation_unit(relation_id, "loki/1")
+
+    assert log_targets(harness)["loki/0"]["services"] == ["envoy"]
+    assert log_targets(harness)["loki/1"]["services"] == ["-all"]
+
+
+def test_unchanged_log_targets_do_not_touch_pebble(harness, mocker):
+    relation_id = harness.add_relation("logging", "loki")
+    add_loki_unit(harness, relation_id, 0)
+
+    add_layer = mocker.spy(harness.charm.unit.get_container("envoy"), "add_layer")
+    harness.charm._logging._update_endpoints(
+        harness.charm.unit.get_container("envoy"), {"loki/0": LOKI_URL.format(0)}
+    )
+
+    add_layer.assert_not_called()
+
+
+def test_last_loki_removal_disables_forwarding(harness):
+    relation_id = harness.add_relation("logging", "loki")
+    add_loki_unit(harness, relation_id, 0)
+
+    harness.remove_relation(relation_id)
+
+    assert log_targets(harness)["loki/0"]["services"] == ["-all"]
@@ -0,0 +1,122 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from ops.testing import Harness
+
+PRECOMPILE_SCRIPT = Path("tools/precompile_observability.py")
+DASHBOARDS_DIR = Path("src/grafana_dashboards")
+ALERT_RULES_DIR = Path("src/prometheus_alert_rules")
+
+
+def precompile(source_dir: Path) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(PRECOMPILE_SCRIPT), "--source-dir", str(source_dir)],
+        capture_output=True,
+        text=True,
+    )
+
+
+@pytest.fixture()
+def charm_source(tmp_path) -> Path:
+    """Copy the charm's dashboards and alert rules, so artifacts can be built next to them."""
+    shutil.copytree(DASHBOARDS_DIR, tmp_path / DASHBOARDS_DIR)
+    shutil.copytree(ALERT_RULES_DIR, tmp_path / ALERT_RULES_DIR)
+    return tmp_path
+
+
+@pytest.fixture()
+def harness(unstarted_harness) -> Harness:
+    unstarted_harness.set_leader(True)
+    unstarted_harness.begin()
+    return unstarted_harness
+
+
+def published(harness, relation_name: str, key: str):
+    relation = harness.model.get_relation(relation_name)
+    return json.loads(relation.data[harness.charm.app][key])
+
+
+def test_dashboards_are_loaded_from_artifact(harness, charm_source, mocker):
+    harness.add_relation("grafana-dashboard", "grafana")
+    expected = published(harness, "grafana-dashboard", "dashboards")["templates"]
+    assert precompile(charm_source).returncode == 0
+
+    compress = mocker.patch("charms.grafana_k8s.v0.grafana_dashboard.LZMABase64.compress")
+    harness.charm.dashboard_provider._dashboards_path = str(charm_source / DASHBOARDS_DIR)
+    harness.charm.dashboard_provider._stored.dashboard_file_hashes = {}
+    harness.charm.dashboard_provider._update_all_dashboards_from_dir()
+
+    compress.assert_not_called()
+    assert published(harness, "grafana-dashboard", "dashboards")["templates"] == expected
+
+
+def test_changed_dashboard_is_not_taken_from_artifact(harness, charm_source, mocker):
+    assert precompile(charm_source).returncode == 0
+    dashboard = next((charm_source / DASHBOARDS_DIR).glob("*.tmpl"))
+    dashboard.write_text(json.dumps({"title": "changed"}))
+
+    compress = mocker.spy(
+        sys.modules["charms.grafana_k8s.v0.grafana_dashboard"].LZMABase64, "compress"
+    )
+    harness.charm.dashboard_provider._dashboards_path = str(charm_source / DASHBOARDS_DIR)
+    harness.charm.dashboard_provider._stored.dashboard_file_hashes = {}
+    harness.charm.dashboard_provider._update_all_dashboards_from_dir()
+
+    compress.assert_called_once_with(dashboard.read_bytes())
+
+
+def test_alert_rules_are_loaded_from_artifact(harness, charm_source, mocker):
+    harness.add_relation("metrics-endpoint", "prometheus")
+    harness.charm.prometheus_provider.set_scrape_job_spec()
+    expected = published(harness, "metrics-endpoint", "alert_rules")
+    assert precompile(charm_source).returncode == 0
+
+    read_rule_file = mocker.patch("cosl.rules._read_rule_file")
+    harness.charm.prometheus_provider._alert_rules_path = str(charm_source / ALERT_RULES_DIR)
+    harness.charm.prometheus_provider.set_scrape_job_spec()
+
+    read_rule_file.assert_not_called()
+    assert published(harness, "metrics-endpoint", "alert_rules") == expected
+
+
+def test_invalid_dashboard_fails_the_build(charm_source):
+    (charm_source / DASHBOARDS_DIR / "broken.json").write_text("{")
+
+    result = precompile(charm_source)
+
+    assert result.returncode == 1
+    assert "broken.json" in result.stderr
+
+
+def test_alert_rules_are_parsed_once_while_unchanged(harness, charm_source, mocker):
+    harness.add_relation("metrics-endpoint", "prometheus")
+    provider = harness.charm.prometheus_provider
+    provider._alert_rules_path = str(charm_source / ALERT_RULES_DIR)
+    add_path = mocker.spy(sys.modules["cosl.rules"].Rules, "add_path")
+
+    provider.set_scrape_job_spec()
+    provider.set_scrape_job_spec()
+    assert add_path.call_count == 1
+
+    rules_file = next((charm_source / ALERT_RULES_DIR).glob("*.rules"))
+    rules_file.write_text(rules_file.read_text().replace("5m", "10m"))
+    provider.set_scrape_job_spec()
+    assert add_path.call_count == 2
+    assert "10m" in json.dumps(published(harness, "metrics-endpoint", "alert_rules"))
+
+
+def test_unchanged_relation_data_is_not_rewritten(harness, mocker):
+    relation_id = harness.add_relation("metrics-endpoint", "prometheus")
+    harness.charm.prometheus_provider.set_scrape_job_spec()
+
+    update_relation_data = mocker.spy(harness._backend, "update_relation_data")
+    harness.charm.prometheus_provider.set_scrape_job_spec()
+
+    update_relation_data.assert_not_called()
+    assert harness.get_relation_data(relation_id, "envoy")["scrape_jobs"]
@@ -0,0 +1,78 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+from unittest.mock import MagicMock, PropertyMock
+
+import pytest
+from lightkube.models.core_v1 import ServicePort
+
+
+@pytest.fixture()
+def mocked_kubernetes_service_patch(mocker):
+    """Keep the charm's KubernetesServicePatch, only mocking the namespace it reads."""
+    return mocker.patch(
+        "charms.observability_libs.v1.kubernetes_service_patch.KubernetesServicePatch._namespace",
+        new_callable=PropertyMock,
+        return_value="kubeflow",
+    )
+
+
+@pytest.fixture()
+def lightkube_client(harness) -> MagicMock:
+    """Mock the charm's shared lightkube client, with a Service that is not yet patched."""
+    client = MagicMock()
+    client.get.return_value.spec.ports = []
+    harness.charm.lightkube_client._client = client
+    return client
+
+
+def test_patch_uses_shared_client_and_is_skipped_when_unchanged(harness, lightkube_client):
+    service_patcher = harness.charm.service_patcher
+
+    service_patcher._patch(None)
+    assert lightkube_client.patch.call_count == 1
+
+    lightkube_client.reset_mock()
+    service_patcher._patch(None)
+    lightkube_client.get.assert_not_called()
+    lightkube_client.patch.assert_not_called()
+
+
+def test_patch_is_reapplied_when_ports_change(harness, lightkube_client):
+    service_patcher = harness.charm.service_patcher
+    service_patcher._patch(None)
+
+    service_patcher.service.spec.ports.append(ServicePort(1234, name="extra"))
+    service_patcher._patch(None)
+
+    assert lightkube_client.patch.call_count == 2
+
+
+def test_upgrade_drops_cached_spec(harness, lightkube_client, mocker):
+    mocker.patch("charms.observability_libs.v1.kubernetes_service_patch.Client")
+    service_patcher = harness.charm.service_patcher
+    service_patcher._patch(None)
+    assert service_patcher._stored.applied_service_hash == service_patcher.service_hash
+
+    lightkube_client.reset_mock()
+    service_patcher._on_upgrade_charm(None)
+
+    lightkube_client.patch.assert_called_once()
+
+
+def test_lightkube_client_is_not_constructed_unless_used(harness):
+    assert not harness.charm.lightkube_client.constructed
+
+
+@pytest.mark.parametrize(
+    "route_type, app_protocol", [("http", None), ("grpc", "kubernetes.io/h2c")]
+)
+def test_http_port_app_protocol_follows_ambient_route_type(
+    unstarted_harness, route_type, app_protocol
+):
+    unstarted_harness.update_config({"ambient-ingress-route-type": route_type})
+    unstarted_harness.begin()
+
+    ports = {
+        port.name: port for port in unstarted_harness.charm.service_patcher.service.spec.ports
+    }
+    assert ports["http"].appProtocol == app_protocol
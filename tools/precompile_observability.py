@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Precompile the charm's Grafana dashboards and Prometheus alert rules at build time.
+
+Every hook that publishes dashboards or alert rules would otherwise LZMA-compress each
+dashboard and YAML-parse each rules file again.  This validates them once and writes:
+
+- `src/grafana_dashboards/.precompiled`: the compressed dashboards
+- `src/prometheus_alert_rules/.precompiled`: the parsed alert rules
+
+GrafanaDashboardProvider and MetricsEndpointProvider use an entry of these artifacts only
+while the hash of its source file still matches, so a stale artifact is never published.
+
+Usage:
+    python3 tools/precompile_observability.py [--source-dir DIR] [--output-dir DIR]
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import lzma
+import sys
+from pathlib import Path
+
+import yaml
+
+DASHBOARDS_DIR = Path("src/grafana_dashboards")
+ALERT_RULES_DIR = Path("src/prometheus_alert_rules")
+PRECOMPILED_FILE_NAME = ".precompiled"
+ARTIFACT_VERSION = 1
+
+# Must match the selection made by the charm libraries
+DASHBOARD_SUFFIXES = (".json", ".json.tmpl", ".tmpl")
+RULE_FILE_SUFFIXES = (".rule", ".rules", ".yml", ".yaml")
+RULE_TYPES = ("alert", "record")
+# Same preset as cosl.LZMABase64
+LZMA_PRESET = 3
+
+
+class PrecompileError(Exception):
+    """Raised when a dashboard or rules file is invalid."""
+
+
+def source_hash(content: bytes) -> str:
+    """Return the hash identifying the source file an artifact entry was built from."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def precompile_dashboards(dashboards_dir: Path) -> dict:
+    """Validate and compress every dashboard in dashboards_dir."""
+    dashboards = {}
+    for path in sorted(dashboards_dir.glob("*")):
+        if not (path.is_file() and path.name.endswith(DASHBOARD_SUFFIXES)):
+            continue
+        content = path.read_bytes()
+        try:
+            json.loads(content)
+        except json.JSONDecodeError as e:
+            raise PrecompileError(f"Invalid dashboard {path}: {e}") from e
+        dashboards[f"file:{path.stem}"] = {
+            "source_hash": source_hash(content),
+            "content": base64.b64encode(lzma.compress(content, preset=LZMA_PRESET)).decode(),
+        }
+    return {"version": ARTIFACT_VERSION, "dashboards": dashboards}
+
+
+def _validate_rule_file(path: Path, rule_file) -> None:
+    """Raise PrecompileError unless rule_file is in official or single-rule format."""
+    if not isinstance(rule_file, dict):
+        raise PrecompileError(f"Invalid rules file {path}: not a mapping")
+    if "groups" in rule_file:
+        rules = [rule for group in rule_file["groups"] for rule in group.get("rules", [])]
+    else:
+        rules = [rule_file]
+    for rule in rules:
+        if "expr" not in rule or not any(key in rule for key in RULE_TYPES):
+            raise PrecompileError(f"Invalid rule in {path}: {rule}")
+
+
+def precompile_alert_rules(alert_rules_dir: Path) -> dict:
+    """Validate and parse every rules file in alert_rules_dir, recursively."""
+    rule_files = {}
+    for path in sorted(alert_rules_dir.rglob("*")):
+        if not (path.is_file() and path.suffix in RULE_FILE_SUFFIXES):
+            continue
+        content = path.read_bytes()
+        try:
+            rule_file = yaml.safe_load(content)
+        except yaml.YAMLError as e:
+            raise PrecompileError(f"Invalid rules file {path}: {e}") from e
+        _validate_rule_file(path, rule_file)
+        rule_files[path.relative_to(alert_rules_dir).as_posix()] = {
+            "source_hash": source_hash(content),
+            "rules": rule_file,
+        }
+    return {"version": ARTIFACT_VERSION, "rule_files": rule_files}
+
+
+def write_artifact(artifact: dict, path: Path) -> None:
+    """Write an artifact as JSON, creating its directory if needed."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(artifact, sort_keys=True))
+    print(f"Wrote {path}")
+
+
+def main(argv=None) -> int:
+    """Precompile the dashboards and alert rules found under --source-dir."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source-dir", type=Path, default=Path("."), help="charm source tree")
+    parser.add_argument(
+        "--output-dir", type=Path, default=None, help="where to write (default: --source-dir)"
+    )
+    args = parser.parse_args(argv)
+    output_dir = args.output_dir or args.source_dir
+
+    try:
+        write_artifact(
+            precompile_dashboards(args.source_dir / DASHBOARDS_DIR),
+            output_dir / DASHBOARDS_DIR / PRECOMPILED_FILE_NAME,
+        )
+        write_artifact(
+            precompile_alert_rules(args.source_dir / ALERT_RULES_DIR),
+            output_dir / ALERT_RULES_DIR / PRECOMPILED_FILE_NAME,
+        )
+    except PrecompileError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())